@@ -0,0 +1,106 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from models import db
+from bulk import insert_rows
+
+
+QUEUE_SIZE = int(os.environ.get("ACTIVITY_QUEUE_SIZE", 10000))
+BATCH_SIZE = int(os.environ.get("ACTIVITY_BATCH_SIZE", 200))
+FLUSH_SECONDS = float(os.environ.get("ACTIVITY_FLUSH_SECONDS", 2.0))
+
+COLUMNS = ["user_id", "action", "timestamp"]
+
+_app = None
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def init_activity(app):
+    """Bind the activity writer to the Flask app; the writer thread starts on the first event."""
+    global _app
+    _app = app
+    atexit.register(flush)
+
+
+def record(user_id, action):
+    """
+    Queue an activity log row; a background writer inserts queued rows in
+    batches. If the queue is full the row is written synchronously on its own
+    connection, so the caller's session is never committed.
+    """
+    event = {"user_id": user_id, "action": action, "timestamp": datetime.now()}
+    _ensure_writer()
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        _write_direct([event])
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        # gunicorn forks after import, so each worker starts its own writer
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run, name="activity-writer", daemon=True)
+            _writer.start()
+
+
+def _drain(first, deadline):
+    batch = [first]
+    while len(batch) < BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _run():
+    while True:
+        first = _queue.get()
+        batch = _drain(first, time.monotonic() + FLUSH_SECONDS)
+        _write_batch(batch)
+
+
+def _write_batch(batch):
+    with _app.app_context():
+        try:
+            insert_rows("activity_logs", COLUMNS, batch, chunk_size=BATCH_SIZE)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Activity Log Error ({len(batch)} rows dropped):", e)
+
+
+def _write_direct(events):
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(db.text(
+                "INSERT INTO activity_logs (user_id, action, timestamp) VALUES (:user_id, :action, :timestamp)"
+            ), events)
+    except Exception as e:
+        print("Activity Log Error:", e)
+
+
+def flush():
+    """Write everything still queued; used at shutdown and by scripts that exit right away."""
+    batch = []
+    while True:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch and _app is not None:
+        for start in range(0, len(batch), BATCH_SIZE):
+            _write_batch(batch[start:start + BATCH_SIZE])
@@ -1,12 +1,36 @@
 from flask import Flask, render_template, redirect, url_for, request, session, flash, send_file, jsonify
+from markupsafe import Markup
+import click
 import re
 import os
+import time
 import io
 import csv
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
-from models import init_app as init_models, db, User, Role, Student, Teacher, Class, Subject
+from models import init_app as init_models, db, User, Role, Student, Teacher, Class, Subject, BackgroundJob, classes_has_teachers
+from db import pool_stats
 from sqlalchemy import func
+from reports import report_aggregates, sample_results as report_sample_results
+from reports import export_sql as report_export_sql, EXPORT_COLUMNS as REPORT_EXPORT_COLUMNS
+import rollups
+import indexes
+import schema
+from importer import run_import, username_base, generate_password
+import jobs
+import perf
+import cache
+import quiz_content
+import reference
+import profiles
+import teacher_stats
+import conditional
+import exports
+import submissions
+import activity
+import drafts
+from pagination import PageRequest, paginate, cached_count
+from bulk import insert_rows, update_rows
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "supersecretkey")
@@ -14,6 +38,10 @@ app.permanent_session_lifetime = timedelta(days=30)
 
 # Initialize SQLAlchemy models and ensure required schema bits exist
 init_models(app)
+jobs.init_jobs(app)
+perf.init_perf(app)
+activity.init_activity(app)
+drafts.init_drafts(app)
 
 
 def validate_username(username):
@@ -52,8 +80,26 @@ def _add_credential(username, temp_password, full_name="", email=""):
     session.modified = True
 
 
+def _credentials_csv(creds):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["Full Name", "Email", "Username", "Temporary Password"])
+    for item in creds:
+        writer.writerow([item.get('full_name', ''), item.get('email', ''), item['username'], item['password']])
+    return output.getvalue()
+
+
+def _flash_job_queued(job_id, label):
+    download_url = url_for('admin_job_download', job_id=job_id)
+    # Markup.format escapes the values it fills in
+    flash(Markup(
+        "{} is running in the background (job #{}). "
+        "<a href=\"{}\">Download the credentials</a> once it finishes."
+    ).format(label, job_id, download_url), 'info')
+
+
 def _generate_username(base: str) -> str:
-    base = re.sub(r"[^a-zA-Z0-9]", "", base).lower()[:12] or "user"
+    base = username_base(base)
     candidate = base
     n = 1
     with app.app_context():
@@ -64,17 +110,7 @@ def _generate_username(base: str) -> str:
 
 
 def _generate_password(length: int = 10) -> str:
-    import secrets, string
-    alphabet = string.ascii_letters + string.digits + "!@#$%^&*()"
-    pw = ''.join(secrets.choice(alphabet) for _ in range(length))
-    # Ensure complexity
-    if not any(c.islower() for c in pw):
-        pw = 'a' + pw[1:]
-    if not any(c.isupper() for c in pw):
-        pw = 'A' + pw[1:]
-    if not any(c.isdigit() for c in pw):
-        pw = '1' + pw[1:]
-    return pw
+    return generate_password(length)
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -102,6 +138,7 @@ def login():
                         session["user"] = user.username
                         session["role_id"] = user.role_id
                         session["user_id"] = user.user_id
+                        profiles.load_for(user)
                         if getattr(user, 'force_password_change', 0):
                             return redirect(url_for("change_password"))
                         if user.role_id == 1:
@@ -140,27 +177,100 @@ def home():
         return redirect(url_for("login"))
     return render_template("home.html", username='session["user"]')
 
+
+DASHBOARD_TTL = 60  # seconds; class/subject/user writes invalidate their prefix right away
+
+
+def _dashboard_scalar(key, sql):
+    return cache.cached(key, lambda: db.session.execute(db.text(sql)).scalar() or 0, ttl=DASHBOARD_TTL)
+
+
+def _dashboard_rows(key, sql):
+    """Cached reference list as plain dicts (templates read them like rows)."""
+    return cache.cached(
+        key,
+        lambda: [dict(r) for r in db.session.execute(db.text(sql)).mappings()],
+        ttl=DASHBOARD_TTL,
+    )
+
+
+LIVE_EXAM_LIMIT = 30        # upcoming + live quizzes shown, soonest start first
+FINISHED_EXAM_DAYS = 7      # finished quizzes are shown for this many days...
+FINISHED_EXAM_LIMIT = 10    # ...up to this many, most recently ended first
+LIVE_EXAM_STATUS_ORDER = {"upcoming": 1, "live": 2, "finished": 3}
+
+
+def _live_exam_rows(where_sql, order_sql, params):
+    return db.session.execute(db.text(f"""
+        SELECT
+            q.quiz_id,
+            q.title,
+            q.exam_type,
+            q.percentage_weight,
+            q.class_id,
+            q.teacher_id,
+            u.full_name AS teacher_name,
+            s.subject_name,
+            c.class_name,
+            c.grade_level,
+            q.start_time,
+            q.end_time,
+            q.is_active,
+            COALESCE(sc.total_students, 0) AS total_students,
+            TIMESTAMPDIFF(MINUTE, NOW(), q.end_time) AS minutes_left,
+            CASE
+                WHEN NOW() < q.start_time THEN 'upcoming'
+                WHEN q.end_time IS NULL THEN 'live'
+                WHEN NOW() BETWEEN q.start_time AND q.end_time THEN 'live'
+                ELSE 'finished'
+            END AS status
+        FROM quizzes q
+        JOIN subjects s ON q.subject_id = s.subject_id
+        JOIN classes c ON q.class_id = c.class_id
+        LEFT JOIN teachers t ON q.teacher_id = t.teacher_id
+        LEFT JOIN users u ON t.users_user_id = u.user_id
+        LEFT JOIN (
+            SELECT class_id, COUNT(*) AS total_students
+            FROM students
+            GROUP BY class_id
+        ) sc ON sc.class_id = q.class_id
+        WHERE {where_sql}
+        ORDER BY {order_sql}
+        LIMIT :limit
+    """), params).fetchall()
+
+
+def _live_exam_feed():
+    """
+    Exam Status Monitoring panel: upcoming and live quizzes plus the ones that
+    finished in the last FINISHED_EXAM_DAYS, each capped, so the query does
+    not grow with exam history. Both halves range-scan quizzes.end_time.
+    """
+    # Soonest start first, so live quizzes are never cut off by far-future ones.
+    # Quizzes without an end_time never close, so they stay in the open half.
+    open_exams = _live_exam_rows(
+        "(q.end_time IS NULL OR q.end_time >= NOW())", "q.start_time ASC", {"limit": LIVE_EXAM_LIMIT}
+    )
+    finished = _live_exam_rows(
+        "q.end_time < NOW() AND q.end_time >= NOW() - INTERVAL :days DAY",
+        "q.end_time DESC",
+        {"days": FINISHED_EXAM_DAYS, "limit": FINISHED_EXAM_LIMIT},
+    )
+    # Upcoming first, then live (sort is stable, so start_time order holds)
+    return sorted(open_exams, key=lambda r: LIVE_EXAM_STATUS_ORDER[r.status]) + list(finished)
+
+
 @app.route("/admin/dashboard")
 def admin_dashboard():
 
     if not is_logged_in() or session.get("role_id") != 1:
         return redirect(url_for("login"))
 
-    total_students = db.session.execute(
-        db.text("SELECT COUNT(*) FROM students")
-    ).scalar()
-
-    total_teachers = db.session.execute(
-        db.text("SELECT COUNT(*) FROM teachers")
-    ).scalar()
-
-    total_classes = db.session.execute(
-        db.text("SELECT COUNT(*) FROM classes WHERE is_active = 1")
-    ).scalar()
-
-    total_subjects = db.session.execute(
-        db.text("SELECT COUNT(*) FROM subjects WHERE is_active = 1")
-    ).scalar()
+    # Counters and filter lists change rarely; the entity write routes invalidate their prefix
+    total_students = _dashboard_scalar("students:count:all", "SELECT COUNT(*) FROM students")
+    total_teachers = _dashboard_scalar("teachers:count:all", "SELECT COUNT(*) FROM teachers")
+    total_classes = _dashboard_scalar("classes:count:active", "SELECT COUNT(*) FROM classes WHERE is_active = 1")
+    total_subjects = _dashboard_scalar("subjects:count:active", "SELECT COUNT(*) FROM subjects WHERE is_active = 1")
 
     notifications = db.session.execute(db.text("""
         SELECT 
@@ -178,68 +288,26 @@ def admin_dashboard():
     top_result = 60
     average_result = 30
     fail_result = 10
-    grades = db.session.execute(db.text("""
+    grades = _dashboard_rows("classes:grade_levels", """
         SELECT DISTINCT grade_level
         FROM classes
         ORDER BY grade_level
-    """)).fetchall()
+    """)
 
-    teachers = db.session.execute(db.text("""
+    teachers = _dashboard_rows("teachers:active_list", """
         SELECT user_id, full_name
         FROM users
         WHERE role_id = 2 AND is_active = 1
         ORDER BY full_name
-    """)).fetchall()
+    """)
 
-    years = db.session.execute(db.text("""
+    years = _dashboard_rows("classes:academic_years", """
         SELECT DISTINCT academic_year
         FROM classes
         ORDER BY academic_year DESC
-    """)).fetchall()
+    """)
 
-    live_exams = db.session.execute(db.text("""
-        SELECT 
-            q.quiz_id,
-            q.title,
-            q.exam_type,
-            q.percentage_weight,
-            q.class_id,
-            q.teacher_id,
-            u.full_name AS teacher_name,
-            s.subject_name,
-            c.class_name,
-            c.grade_level,
-            q.start_time,
-            q.end_time,
-            q.is_active,
-
-            -- Student count
-            (SELECT COUNT(*) FROM students st WHERE st.class_id = q.class_id) AS total_students,
-
-            -- Minutes remaining
-            TIMESTAMPDIFF(MINUTE, NOW(), q.end_time) AS minutes_left,
-
-            -- Determine exam status
-            CASE
-                WHEN NOW() < q.start_time THEN 'upcoming'
-                WHEN NOW() BETWEEN q.start_time AND q.end_time THEN 'live'
-                ELSE 'finished'
-            END AS status
-
-        FROM quizzes q
-        JOIN subjects s ON q.subject_id = s.subject_id
-        JOIN classes c ON q.class_id = c.class_id
-        LEFT JOIN teachers t ON q.teacher_id = t.teacher_id
-        LEFT JOIN users u ON t.users_user_id = u.user_id
-
-        ORDER BY 
-            CASE
-                WHEN NOW() < q.start_time THEN 1          -- Upcoming first
-                WHEN NOW() BETWEEN q.start_time AND q.end_time THEN 2  -- Live next
-                ELSE 3                                    -- Finished last
-            END,
-            q.start_time ASC
-    """)).fetchall()
+    live_exams = _live_exam_feed()
 
     return render_template(
         "admin/admin_dashboard.html",
@@ -267,17 +335,9 @@ def admin_dashboard():
 
 @app.route("/admin/get_subjects/<int:class_id>")
 def get_subjects(class_id):
-    rows = db.session.execute(db.text("""
-        SELECT s.subject_id, s.subject_name
-        FROM subjects_has_classes shc
-        JOIN subjects s ON s.subject_id = shc.subject_id
-        WHERE shc.class_id = :cid
-        ORDER BY s.subject_name ASC
-    """), {"cid": class_id}).fetchall()
-
-    return jsonify([
-        {"id": r.subject_id, "name": r.subject_name}
-        for r in rows
+    return reference.conditional_json(lambda ref: [
+        {"id": s["subject_id"], "name": s["subject_name"]}
+        for s in ref.subjects_by_class.get(class_id, [])
     ])
 
 @app.route("/admin/examination", methods=["GET"])
@@ -349,27 +409,7 @@ def get_teachers_by_grade():
     if not grade:
         return jsonify([])
 
-    teacher_rows = db.session.execute(db.text("""
-        SELECT DISTINCT 
-            t.teacher_id,
-            u.full_name
-        FROM classes c
-        JOIN classes_has_teachers cht 
-            ON cht.classes_class_id = c.class_id
-        JOIN teachers t 
-            ON t.teacher_id = cht.teachers_teacher_id
-        JOIN users u 
-            ON u.user_id = t.users_user_id
-        WHERE c.grade_level = :grade
-          AND u.is_active = 1
-    """), {"grade": grade}).fetchall()
-
-    teachers = [
-        {"teacher_id": row.teacher_id, "full_name": row.full_name}
-        for row in teacher_rows
-    ]
-
-    return jsonify(teachers)
+    return reference.conditional_json(lambda ref: ref.teachers_by_grade.get(str(grade), []))
 
 @app.route("/admin/grade")
 def admin_grade():
@@ -383,258 +423,52 @@ def get_classes_by_grade():
         return jsonify({'error': 'Unauthorized'}), 403
     
     grade = request.args.get('grade', '').strip()
-    
-    with app.app_context():
-        if grade:
-            # Fetch classes for the selected grade
-            classes = Class.query.filter_by(grade_level=grade, is_active=1).order_by(Class.class_name).all()
-        else:
-            # Fetch all classes
-            classes = Class.query.filter_by(is_active=1).order_by(Class.grade_level, Class.class_name).all()
-        
-        return jsonify({
-            'classes': [{'class_id': c.class_id, 'class_name': c.class_name, 'grade_level': c.grade_level} for c in classes]
-        })
-
-
-@app.route("/admin/report")
-def admin_report():
-    if not is_logged_in() or session.get("role_id") != 1:
-        return redirect(url_for("login"))
-
-    # Real data pipeline
-    grade_filter = (request.args.get("grade") or "").strip()
-    class_filter = (request.args.get("class") or "").strip()
-    subject_filter = (request.args.get("subject") or "").strip()
-    year_filter = (request.args.get("year") or "").strip()
-    term_filter = (request.args.get("term") or "").strip()
 
-    # Reference data for filters
-    classes = Class.query.filter_by(is_active=1).order_by(Class.grade_level, Class.class_name).all()
-    subjects = Subject.query.filter_by(is_active=1).order_by(Subject.subject_name).all()
-
-    # If class filter is provided but not valid, reset to "all"
-    if class_filter:
-        valid_class_names = {c.class_name for c in classes}
-        if class_filter not in valid_class_names:
-            class_filter = ""
-
-    academic_year_rows = db.session.execute(db.text("""
-        SELECT DISTINCT academic_year
-        FROM classes
-        WHERE academic_year IS NOT NULL AND academic_year <> ''
-        ORDER BY academic_year DESC
-    """)).fetchall()
-    academic_years = [r.academic_year for r in academic_year_rows]
-
-    # Build test result query with filters
-    query = db.text(
-        """
-        SELECT
-            tr.result_id,
-            tr.test_date,
-            tr.quiz_score,
-            tr.total_score,
-            tr.grade,
-            tr.student_id,
-            tr.class_id,
-            tr.subject_id,
-            st.student_id AS sid,
-            u.full_name,
-            u.username,
-            c.class_name,
-            c.grade_level,
-            c.academic_year,
-            sub.subject_name
-        FROM test_results tr
-        JOIN students st ON st.student_id = tr.student_id
-        JOIN users u ON u.user_id = st.users_user_id
-        LEFT JOIN classes c ON c.class_id = tr.class_id
-        LEFT JOIN subjects sub ON sub.subject_id = tr.subject_id
-        WHERE 1=1
-        """
-    )
-
-    params = {}
-    conditions = []
-    if grade_filter:
-        conditions.append("AND c.grade_level = :grade")
-        params["grade"] = grade_filter
-    if class_filter:
-        conditions.append("AND c.class_name = :class_name")
-        params["class_name"] = class_filter
-    if subject_filter:
-        conditions.append("AND sub.subject_name = :subject_name")
-        params["subject_name"] = subject_filter
-    if year_filter:
-        conditions.append("AND (c.academic_year = :year)")
-        params["year"] = year_filter
-    # term_filter is ignored because test_results is not linked to quiz_id in the schema
-
-    if conditions:
-        query = db.text(query.text + " " + " ".join(conditions))
+    def build(ref):
+        # Classes for the selected grade, or all active classes
+        classes = ref.active_classes_by_grade.get(grade, []) if grade else ref.active_classes
+        return {
+            'classes': [{'class_id': c['class_id'], 'class_name': c['class_name'], 'grade_level': c['grade_level']} for c in classes]
+        }
 
-    query = db.text(query.text + " ORDER BY tr.test_date DESC, tr.result_id DESC")
+    return reference.conditional_json(build)
 
-    rows = db.session.execute(query, params).fetchall()
 
-    # Summary metrics (prefer tr.total_score when available; fall back to tr.quiz_score)
-    scores = []
-    for r in rows:
-        if getattr(r, 'total_score', None) is not None:
-            try:
-                scores.append(float(r.total_score))
-            except (TypeError, ValueError):
-                continue
-        elif getattr(r, 'quiz_score', None) is not None:
-            try:
-                scores.append(float(r.quiz_score))
-            except (TypeError, ValueError):
-                continue
-    total_results = len(scores)
-    total_students = len({r.student_id for r in rows})
-    average_score = round(sum(scores) / total_results, 1) if total_results else 0.0
-    pass_count = sum(1 for s in scores if s >= 60)
-    top_performers = sum(1 for s in scores if s >= 90)
-    need_support = sum(1 for s in scores if s < 60)
-    pass_rate = round((pass_count / total_results) * 100, 1) if total_results else 0.0
-
-    # Grade distribution buckets (based on the same score list)
-    dist_buckets = {
-        "A (90-100)": {"count": 0, "color": "#10b981", "min": 90},
-        "B (80-89)": {"count": 0, "color": "#3b82f6", "min": 80},
-        "C (70-79)": {"count": 0, "color": "#f59e0b", "min": 70},
-        "D (60-69)": {"count": 0, "color": "#f97316", "min": 60},
-        "F (<60)": {"count": 0, "color": "#ef4444", "min": 0},
+def _admin_report_filters(ref):
+    """The admin report filters from the query string (shared with its export)."""
+    filters = {
+        key: (request.args.get(key) or "").strip()
+        for key in ("grade", "class", "subject", "year", "term")
     }
-    for s in scores:
-        if s >= 90:
-            dist_buckets["A (90-100)"]["count"] += 1
-        elif s >= 80:
-            dist_buckets["B (80-89)"]["count"] += 1
-        elif s >= 70:
-            dist_buckets["C (70-79)"]["count"] += 1
-        elif s >= 60:
-            dist_buckets["D (60-69)"]["count"] += 1
-        else:
-            dist_buckets["F (<60)"]["count"] += 1
-
-    grade_distribution = []
-    for label, info in dist_buckets.items():
-        count = info["count"]
-        percent = round((count / total_results) * 100, 1) if total_results else 0
-        grade_distribution.append({
-            "label": label,
-            "percent": percent,
-            "count": count,
-            "color": info["color"],
-        })
+    # If class filter is provided but not valid, reset to "all"
+    if filters["class"]:
+        valid_class_names = {c["class_name"] for c in ref.active_classes}
+        if filters["class"] not in valid_class_names:
+            filters["class"] = ""
+    return filters
 
-    # Grade distribution buckets
-    dist_buckets = {
-        "A (90-100)": {"count": 0, "color": "#10b981", "min": 90},
-        "B (80-89)": {"count": 0, "color": "#3b82f6", "min": 80},
-        "C (70-79)": {"count": 0, "color": "#f59e0b", "min": 70},
-        "D (60-69)": {"count": 0, "color": "#f97316", "min": 60},
-        "F (<60)": {"count": 0, "color": "#ef4444", "min": 0},
-    }
-    for s in scores:
-        if s >= 90:
-            dist_buckets["A (90-100)"]["count"] += 1
-        elif s >= 80:
-            dist_buckets["B (80-89)"]["count"] += 1
-        elif s >= 70:
-            dist_buckets["C (70-79)"]["count"] += 1
-        elif s >= 60:
-            dist_buckets["D (60-69)"]["count"] += 1
-        else:
-            dist_buckets["F (<60)"]["count"] += 1
-
-    grade_distribution = []
-    for label, info in dist_buckets.items():
-        count = info["count"]
-        percent = round((count / total_results) * 100, 1) if total_results else 0
-        grade_distribution.append({
-            "label": label,
-            "percent": percent,
-            "count": count,
-            "color": info["color"],
-        })
 
-    # Subject-wise averages (prefer total_score when present)
-    subject_scores = {}
-    for r in rows:
-        score_val = None
-        if getattr(r, 'total_score', None) is not None:
-            try:
-                score_val = float(r.total_score)
-            except (TypeError, ValueError):
-                score_val = None
-        elif getattr(r, 'quiz_score', None) is not None:
-            try:
-                score_val = float(r.quiz_score)
-            except (TypeError, ValueError):
-                score_val = None
-        if score_val is None:
-            continue
-        subject_scores.setdefault(r.subject_name or "Unknown", []).append(score_val)
-    subject_averages = {
-        k: round(sum(v) / len(v), 1)
-        for k, v in subject_scores.items()
-    }
+@app.route("/admin/report")
+def admin_report():
+    if not is_logged_in() or session.get("role_id") != 1:
+        return redirect(url_for("login"))
 
-    # Performance trend by grade level (prefer total_score when present)
-    grade_scores = {}
-    for r in rows:
-        score_val = None
-        if getattr(r, 'total_score', None) is not None:
-            try:
-                score_val = float(r.total_score)
-            except (TypeError, ValueError):
-                score_val = None
-        elif getattr(r, 'quiz_score', None) is not None:
-            try:
-                score_val = float(r.quiz_score)
-            except (TypeError, ValueError):
-                score_val = None
-        if score_val is None:
-            continue
-        key = f"Grade {r.grade_level}" if r.grade_level else "Ungraded"
-        grade_scores.setdefault(key, []).append(score_val)
+    # Reference data for filters
+    ref = reference.get()
+    classes = ref.active_classes
+    subjects = ref.active_subjects
+    academic_years = ref.academic_years
 
-    performance_trend = {
-        "labels": list(grade_scores.keys()),
-        "values": [round(sum(vals) / len(vals), 1) for vals in grade_scores.values()],
-    }
+    # Real data pipeline
+    filters = _admin_report_filters(ref)
+    grade_filter = filters["grade"]
+    class_filter = filters["class"]
+    year_filter = filters["year"]
 
-    # Sample results table data (latest 50) — show total_score when available
-    sample_results = []
-    for r in rows[:50]:
-        if getattr(r, 'total_score', None) is not None:
-            try:
-                score_val = float(r.total_score)
-            except (TypeError, ValueError):
-                score_val = None
-        elif getattr(r, 'quiz_score', None) is not None:
-            try:
-                score_val = float(r.quiz_score)
-            except (TypeError, ValueError):
-                score_val = None
-        else:
-            score_val = None
-
-        grade_val = r.grade if r.grade is not None else score_val
-        remarks = "Excellent" if score_val is not None and score_val >= 90 else "Needs support" if score_val is not None and score_val < 60 else "Good"
-        sample_results.append({
-            "student_id": r.student_id,
-            "name": r.full_name or r.username,
-            "class_name": r.class_name or "N/A",
-            "subject": r.subject_name or "N/A",
-            "test_date": r.test_date.strftime("%Y-%m-%d") if r.test_date else "",
-            "score": score_val if score_val is not None else "--",
-            "grade": grade_val if grade_val is not None else "--",
-            "remarks": remarks,
-        })
+    # KPIs, grade buckets and chart series come from one grouped aggregate query;
+    # only the 50 table rows are fetched individually.
+    summary = report_aggregates(filters)
+    sample_results = report_sample_results(filters, limit=50)
 
     # Regardless of results rows, compute student count scoped by filters so counts stay consistent
     student_query = db.session.query(Student.student_id).join(User, Student.users_user_id == User.user_id).outerjoin(Class, Student.class_id == Class.class_id)
@@ -651,27 +485,31 @@ def admin_report():
     return render_template(
         "admin/report.html",
         total_students=total_students,
-        pass_rate=pass_rate,
-        average_score=average_score,
-        top_performers=top_performers,
-        need_support=need_support,
+        pass_rate=summary["pass_rate"],
+        average_score=summary["average_score"],
+        top_performers=summary["top_performers"],
+        need_support=summary["need_support"],
         classes=classes,
         subjects=subjects,
         academic_years=academic_years,
         sample_results=sample_results,
-        grade_distribution=grade_distribution,
-        performance_trend=performance_trend,
-        subject_averages=subject_averages,
-        filters={
-            "grade": grade_filter,
-            "class": class_filter,
-            "subject": subject_filter,
-            "year": year_filter,
-            "term": term_filter,
-        },
+        grade_distribution=summary["grade_distribution"],
+        performance_trend=summary["performance_trend"],
+        subject_averages=summary["subject_averages"],
+        filters=filters,
         active_page=active_page,
     )
 
+
+@app.route("/admin/report/export")
+def admin_report_export():
+    """Every result row matching the report filters, as CSV or NDJSON (?format=)."""
+    if not is_logged_in() or session.get("role_id") != 1:
+        return redirect(url_for("login"))
+
+    sql, params = report_export_sql(_admin_report_filters(reference.get()))
+    return exports.stream(request.args.get("format", "csv"), "results_report", REPORT_EXPORT_COLUMNS, sql, params)
+
 @app.route("/admin/add_class", methods=["GET", "POST"])
 def admin_add_class():
     if not is_logged_in() or session.get("role_id") != 1:
@@ -712,6 +550,8 @@ def admin_add_class():
                     )
                     db.session.add(new_class)
                     db.session.commit()
+                    cache.invalidate("classes:")
+                    reference.bump()
 
                     log_activity(session["user_id"], f"Created class {class_name}")
                     flash("Class added successfully.", "success")
@@ -737,6 +577,8 @@ def admin_add_class():
                     class_obj.academic_year = academic_year
                     class_obj.max_students = max_students_val
                     db.session.commit()
+                    cache.invalidate("classes:")
+                    reference.bump()
 
                     log_activity(session["user_id"], f"Updated class ID {class_id}")
                     flash("Class updated successfully.", "success")
@@ -747,6 +589,8 @@ def admin_add_class():
             if class_obj:
                 class_obj.is_active = 0
                 db.session.commit()
+                cache.invalidate("classes:")
+                reference.bump()
                 log_activity(session["user_id"], f"Deactivated class {class_obj.class_name}")
                 flash("Class deactivated.", "success")
             else:
@@ -758,6 +602,8 @@ def admin_add_class():
             if class_obj:
                 class_obj.is_active = 1
                 db.session.commit()
+                cache.invalidate("classes:")
+                reference.bump()
                 log_activity(session["user_id"], f"Activated class ID {class_id}")
                 flash("Class activated.", "success")
             else:
@@ -766,14 +612,14 @@ def admin_add_class():
         return redirect(url_for("admin_add_class"))
 
 
-    page = request.args.get("page", 1, type=int)
-    per_page = request.args.get("per_page", 10, type=int)
+    def run_classes(where_sql, order_sql, limit, offset, params):
+        return (Class.query.filter(db.text(where_sql)).params(**params)
+                .order_by(db.text(order_sql)).limit(limit).offset(offset).all())
 
-    if per_page not in [10, 25, 50, 100]:
-        per_page = 10
-
-    classes_pagination = Class.query.order_by(Class.class_id.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    classes_pagination = paginate(
+        run_classes, [("classes.class_id", "desc")], lambda c: [c.class_id],
+        PageRequest.from_args(request.args),
+        cached_count("classes:count", lambda: Class.query.count()),
     )
 
     edit_id = request.args.get("edit_id")
@@ -866,6 +712,7 @@ def admin_results(class_id):
 
     return render_template(
         "admin/results_page.html",
+        class_id=class_id,
         results=results,
         grade=grade,
         class_name=class_name,
@@ -875,6 +722,68 @@ def admin_results(class_id):
         active_page="grade"
     )
 
+
+ADMIN_RESULTS_EXPORT_COLUMNS = [
+    ("result_id", "Result ID"),
+    ("test_date", "Test Date"),
+    ("student_id", "Student ID"),
+    ("student_name", "Student Name"),
+    ("quiz_score", "Quiz 10%"),
+    ("assignment_score", "Assignment 20%"),
+    ("midterm_score", "Midterm 30%"),
+    ("final_score", "Final 40%"),
+    ("total_score", "Total"),
+    ("grade", "Grade"),
+    ("teacher_name", "Teacher"),
+    ("subject_name", "Subject"),
+]
+
+
+@app.route("/admin/results/<int:class_id>/export")
+def admin_results_export(class_id):
+    """A class's results as CSV or NDJSON, optionally narrowed by subject name and test year."""
+    if not is_logged_in() or session.get("role_id") != 1:
+        return redirect(url_for("login"))
+
+    conditions = ["tr.class_id = :cid"]
+    params = {"cid": class_id}
+    subject = (request.args.get("subject") or "").strip().lower()
+    if subject and subject != "all":
+        conditions.append("LOWER(sub.subject_name) = :subject")
+        params["subject"] = subject
+    year = request.args.get("year", type=int)
+    if year:
+        conditions.append("tr.test_date >= :year_start AND tr.test_date < :year_end")
+        params["year_start"] = datetime(year, 1, 1)
+        params["year_end"] = datetime(year + 1, 1, 1)
+
+    sql = f"""
+        SELECT
+            tr.result_id,
+            tr.test_date,
+            s.student_id,
+            u.full_name AS student_name,
+            tr.quiz_score,
+            tr.assignment_score,
+            tr.midterm_score,
+            tr.final_score,
+            tr.total_score,
+            tr.grade,
+            sub.subject_name,
+            u2.full_name AS teacher_name
+        FROM test_results tr
+        JOIN students s ON s.student_id = tr.student_id
+        JOIN users u ON u.user_id = s.users_user_id
+        JOIN subjects sub ON sub.subject_id = tr.subject_id
+        JOIN teachers t ON t.teacher_id = tr.teacher_id
+        JOIN users u2 ON u2.user_id = t.users_user_id
+        WHERE {" AND ".join(conditions)} AND tr.result_id > :after_id
+        ORDER BY tr.result_id
+        LIMIT :batch_size
+    """
+    return exports.stream(request.args.get("format", "csv"), f"class_{class_id}_results",
+                          ADMIN_RESULTS_EXPORT_COLUMNS, sql, params)
+
 @app.route("/admin/add_subject", methods=["GET", "POST"])
 def admin_add_subject():
     if not is_logged_in() or session.get("role_id") != 1:
@@ -897,6 +806,8 @@ def admin_add_subject():
                 )
                 db.session.add(new_subject)
                 db.session.commit()
+                cache.invalidate("subjects:")
+                reference.bump()
                 log_activity(session["user_id"], f"Created subject {subject_name}")
                 flash("Subject added successfully.", "success")
 
@@ -915,6 +826,8 @@ def admin_add_subject():
                     subject.subject_name = subject_name
                     subject.description = description if description else None
                     db.session.commit()
+                    cache.invalidate("subjects:")
+                    reference.bump()
                 log_activity(session["user_id"], f"Updated subject ID {subject_id}")
                 flash("Subject updated successfully.", "success")
 
@@ -925,6 +838,8 @@ def admin_add_subject():
                 if subject:
                     subject.is_active = 0
                     db.session.commit()
+                    cache.invalidate("subjects:")
+                    reference.bump()
                     log_activity(session["user_id"], f"Deactivated subject ID {subject_id}")
                     flash("Subject deactivated.", "success")
             else:
@@ -937,6 +852,8 @@ def admin_add_subject():
                 if subject:
                     subject.is_active = 1
                     db.session.commit()
+                    cache.invalidate("subjects:")
+                    reference.bump()
                     log_activity(session["user_id"], f"Activated subject ID {subject_id}")
                     flash("Subject activated.", "success")
             else:
@@ -945,14 +862,14 @@ def admin_add_subject():
         return redirect(url_for("admin_add_subject"))
 
     # GET: fetch all subjects with pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-
-    if per_page not in [10, 25, 50, 100]:
-        per_page = 10
-
-    subjects_pagination = Subject.query.order_by(Subject.subject_id.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    def run_subjects(where_sql, order_sql, limit, offset, params):
+        return (Subject.query.filter(db.text(where_sql)).params(**params)
+                .order_by(db.text(order_sql)).limit(limit).offset(offset).all())
+
+    subjects_pagination = paginate(
+        run_subjects, [("subjects.subject_id", "desc")], lambda s: [s.subject_id],
+        PageRequest.from_args(request.args),
+        cached_count("subjects:count", lambda: Subject.query.count()),
     )
 
     edit_id = request.args.get("edit_id")
@@ -974,16 +891,15 @@ def admin_users():
     if not is_logged_in() or session.get("role_id") != 1:
         return redirect(url_for("login"))
 
-    # Get pagination parameters
-    students_page = request.args.get('students_page', 1, type=int)
-    teachers_page = request.args.get('teachers_page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # Get pagination parameters (students_*/teachers_* page and cursor, shared per_page)
+    students_req = PageRequest.from_args(request.args, prefix="students_")
+    teachers_req = PageRequest.from_args(request.args, prefix="teachers_")
     student_class_filter = request.args.get('student_class', type=int)
     teacher_class_filter = request.args.get('teacher_class', type=int)
 
     # Provide lists for template
     with app.app_context():
-        cht = db.Table('classes_has_teachers', db.metadata, autoload_with=db.engine)
+        cht = classes_has_teachers
 
         students_query = (
             Student.query
@@ -1005,7 +921,17 @@ def admin_users():
         if student_class_filter:
             students_query = students_query.filter(Student.class_id == student_class_filter)
 
-        students_pagination = students_query.paginate(page=students_page, per_page=per_page, error_out=False)
+        def run_students(where_sql, order_sql, limit, offset, params):
+            return (students_query.filter(db.text(where_sql)).params(**params)
+                    .order_by(db.text(order_sql)).limit(limit).offset(offset).all())
+
+        students_pagination = paginate(
+            run_students,
+            [("COALESCE(users.full_name, '')", "asc"), ("students.student_id", "asc")],
+            lambda r: [r.full_name or "", r.student_id],
+            students_req,
+            cached_count(f"students:count:users:{student_class_filter}", students_query.count),
+        )
         students = students_pagination.items
 
         teachers_query = (
@@ -1032,7 +958,17 @@ def admin_users():
                 .filter(cht.c.classes_class_id == teacher_class_filter)
             )
 
-        teachers_pagination = teachers_query.paginate(page=teachers_page, per_page=per_page, error_out=False)
+        def run_teachers(where_sql, order_sql, limit, offset, params):
+            return (teachers_query.filter(db.text(where_sql)).params(**params)
+                    .order_by(db.text(order_sql)).limit(limit).offset(offset).all())
+
+        teachers_pagination = paginate(
+            run_teachers,
+            [("COALESCE(users.full_name, '')", "asc"), ("teachers.teacher_id", "asc")],
+            lambda r: [r.full_name or "", r.teacher_id],
+            teachers_req,
+            cached_count(f"teachers:count:users:{teacher_class_filter}", teachers_query.count),
+        )
         teachers = teachers_pagination.items
     # Fetch available classes (active and not full) and active subjects for the Add User modal using ORM
     # Available classes: active and below capacity (or unlimited when max_students is NULL)
@@ -1057,18 +993,19 @@ def admin_users():
     active_subjects = Subject.query.filter_by(is_active=1).order_by(Subject.subject_name).all()
     classes_all = Class.query.order_by(Class.grade_level, Class.class_name).all()
 
-    # Map teacher_id -> comma-separated class_ids for edit modal multi-select
-    teacher_class_map = {}
-    for t in teachers:
-        tid = t[1] if len(t) > 1 else None
-        if not tid:
-            continue
-        class_rows = db.session.execute(db.text("""
-            SELECT classes_class_id
-            FROM classes_has_teachers
-            WHERE teachers_teacher_id = :tid
-        """), {"tid": tid}).fetchall()
-        teacher_class_map[tid] = ",".join(str(r.classes_class_id) for r in class_rows) if class_rows else ""
+    # Map teacher_id -> comma-separated class_ids for edit modal multi-select,
+    # loaded for the whole page in one query
+    teacher_ids = [t[1] for t in teachers if len(t) > 1 and t[1]]
+    class_ids_by_teacher = {tid: [] for tid in teacher_ids}
+    if teacher_ids:
+        class_rows = db.session.execute(
+            db.select(classes_has_teachers.c.teachers_teacher_id, classes_has_teachers.c.classes_class_id)
+            .where(classes_has_teachers.c.teachers_teacher_id.in_(teacher_ids))
+            .order_by(classes_has_teachers.c.teachers_teacher_id, classes_has_teachers.c.classes_class_id)
+        ).fetchall()
+        for r in class_rows:
+            class_ids_by_teacher[r.teachers_teacher_id].append(str(r.classes_class_id))
+    teacher_class_map = {tid: ",".join(cids) for tid, cids in class_ids_by_teacher.items()}
 
     creds_available = len(_get_cred_list()) > 0
     return render_template(
@@ -1151,6 +1088,9 @@ def admin_create_user_related():
                     """), {"cid": int(cid), "tid": t.teacher_id})
 
             db.session.commit()
+        cache.invalidate(f"{entity}s:")
+        if entity == "teacher":
+            reference.bump()
         _add_credential(username, temp_pw, full_name, email or "")
         flash(f"{entity.title()} and user created. Credentials added to one-time list.", "success")
     except Exception as e:
@@ -1184,6 +1124,9 @@ def admin_toggle_user_status(user_id):
         u = User.query.get_or_404(user_id)
         u.is_active = 0 if u.is_active == 1 else 1
         db.session.commit()
+        cache.invalidate("students:" if u.role_id == 3 else "teachers:")
+        if u.role_id != 3:
+            reference.bump()
         status = "activated" if u.is_active == 1 else "deactivated"
         category = "success" if u.is_active == 1 else "danger"
         flash(f"User {u.username} has been {status}.", category)
@@ -1226,6 +1169,10 @@ def admin_edit_user(user_id):
                 """), {"cid": int(cid), "tid": u.teacher_profile.teacher_id})
 
         db.session.commit()
+        cache.invalidate("students:" if u.role_id == 3 else "teachers:")
+        profiles.invalidate(u.user_id)
+        if u.role_id != 3:
+            reference.bump()
         flash(f"User {u.username} has been updated.", "success")
     return redirect(url_for("admin_users"))
 
@@ -1255,15 +1202,7 @@ def admin_download_credentials():
         mimetype = 'text/plain'
     else:
         # CSV as the default
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Full Name", "Email", "Username", "Temporary Password"])
-        for item in creds:
-            full_name = item.get('full_name', '')
-            email = item.get('email', '')
-            writer.writerow([full_name, email, item['username'], item['password']])
-        data = io.BytesIO(output.getvalue().encode('utf-8'))
-        output.close()
+        data = io.BytesIO(_credentials_csv(creds).encode('utf-8'))
         filename = f"credentials_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         mimetype = 'text/csv'
 
@@ -1305,46 +1244,186 @@ def admin_import_users():
         return redirect(url_for('login'))
     file = request.files.get('file')
     entity = request.form.get('entity')  # student or teacher
-    if not file or not entity:
+    if not file or entity not in ('student', 'teacher'):
         flash('Please select a CSV file and entity type.', 'danger')
         return redirect(url_for('admin_users'))
     filename = file.filename.lower()
     if not filename.endswith('.csv'):
         flash('Only CSV files are supported in this build.', 'warning')
         return redirect(url_for('admin_users'))
-    stream = io.TextIOWrapper(file.stream, encoding='utf-8')
-    reader = csv.DictReader(stream)
-    created = 0
-    with app.app_context():
-        for row in reader:
-            full_name = (row.get('full_name') or '').strip() or (row.get('name') or 'New User')
-            email = (row.get('email') or '').strip() or None
-            phone = (row.get('phone') or '').strip() or None
-            class_id = (row.get('class_id') or '').strip()
-            subject_id = (row.get('subject_id') or '').strip()
-            role_id = 3 if entity == 'student' else 2
-            username = _generate_username(full_name.split()[0] if full_name else entity)
-            temp_pw = _generate_password()
-            hashed = generate_password_hash(temp_pw)
-            u = User(username=username, password=hashed, full_name=full_name, email=email, role_id=role_id, is_active=1, phone=phone, force_password_change=1)
-            db.session.add(u)
-            db.session.flush()
-            if entity == 'student':
-                s = Student(class_id=int(class_id) if class_id else None, users_user_id=u.user_id)
-                db.session.add(s)
-            else:
-                t = Teacher(subject_id=int(subject_id) if subject_id else None, users_user_id=u.user_id)
-                db.session.add(t)
-            _add_credential(username, temp_pw, full_name, email or "")
-            created += 1
-        db.session.commit()
-    flash(f"Imported {created} {entity}s and generated credentials.", 'success')
+    csv_text = io.TextIOWrapper(file.stream, encoding='utf-8').read()
+    job_id = jobs.submit('import_users', session['user_id'], csv_text=csv_text, entity=entity)
+    _flash_job_queued(job_id, f"The {entity} import")
     return redirect(url_for('admin_users'))
 
 
 #endregion
 
 
+@jobs.job('import_users')
+def _import_users_job(ctx, csv_text, entity, actor_id=None, log_as=None, **parse_options):
+    reader = csv.DictReader(io.StringIO(csv_text))
+    report = run_import(reader, entity, progress=ctx.progress, **parse_options)
+    if report.created:
+        cache.invalidate(f"{entity}s:")
+        if entity == "teacher":
+            reference.bump()
+    if log_as and actor_id:
+        log_activity(actor_id, f"Imported {report.created} {log_as} from CSV")
+
+    message = f"Imported {report.created} {entity}s and generated credentials."
+    if report.errors:
+        message += f" {len(report.errors)} row(s) skipped: {report.error_summary()}"
+    return {
+        "message": message,
+        "content": _credentials_csv(report.credentials),
+        "filename": f"credentials_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        "mimetype": "text/csv",
+        "one_time": True,
+    }
+
+
+@jobs.job('reset_passwords')
+def _reset_passwords_job(ctx, actor_id=None, role_id=None, class_id=None, academic_year=None):
+    from reset_all_passwords import reset_passwords
+    updated = []
+    # Admin accounts and the caller are never reset from the web
+    reset_passwords(
+        progress=ctx.progress, on_update=lambda u, p: updated.append((u, p)),
+        role_id=role_id, class_id=class_id, academic_year=academic_year,
+        exclude_role_ids=(1,), exclude_user_id=actor_id,
+    )
+    if actor_id:
+        log_activity(actor_id, f"Reset {len(updated)} user passwords")
+    return {
+        "message": f"Updated {len(updated)} user passwords.",
+        "content": _credentials_csv([{"username": u, "password": p} for u, p in updated]),
+        "filename": f"reset_passwords_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        "mimetype": "text/csv",
+        "one_time": True,
+    }
+
+
+# Job types admins may start directly through POST /admin/jobs
+SUBMITTABLE_JOBS = {'reset_passwords'}
+
+# Roles a web-started password reset may target (admins are excluded)
+RESET_ROLE_IDS = {"teacher": 2, "student": 3}
+
+
+def _reset_job_options(data):
+    """role / class_id / academic_year filters for the reset job; raises ValueError on bad input."""
+    role = data.get("role")
+    if role and role not in RESET_ROLE_IDS:
+        raise ValueError("role must be 'teacher' or 'student'.")
+    class_id = data.get("class_id")
+    return {
+        "role_id": RESET_ROLE_IDS.get(role),
+        "class_id": int(class_id) if class_id not in (None, "") else None,
+        "academic_year": (str(data.get("academic_year") or "").strip() or None),
+    }
+
+
+@app.route("/admin/jobs", methods=["GET", "POST"])
+def admin_jobs():
+    if not is_logged_in() or session.get("role_id") != 1:
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+
+    if request.method == "POST":
+        # JSON only: a cross-site form post cannot send application/json without a preflight
+        data = request.get_json(silent=True) if request.is_json else None
+        if not isinstance(data, dict):
+            return jsonify({"ok": False, "error": "Expected a JSON body."}), 415
+        job_type = data.get("type")
+        if job_type not in SUBMITTABLE_JOBS:
+            return jsonify({"ok": False, "error": "Unknown job type."}), 400
+        if data.get("confirm") != job_type:
+            return jsonify({"ok": False, "error": f'Set "confirm": "{job_type}" to start this job.'}), 400
+        try:
+            options = _reset_job_options(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        job_id = jobs.submit(job_type, session["user_id"], actor_id=session["user_id"], **options)
+        return jsonify({
+            "ok": True,
+            "job_id": job_id,
+            "status_url": url_for("admin_job_status", job_id=job_id),
+        }), 202
+
+    records = BackgroundJob.query.order_by(BackgroundJob.job_id.desc()).limit(50).all()
+    return jsonify({"ok": True, "jobs": [jobs.serialize(r) for r in records]})
+
+
+@app.route("/admin/jobs/<int:job_id>")
+def admin_job_status(job_id):
+    if not is_logged_in() or session.get("role_id") != 1:
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    record = BackgroundJob.query.get(job_id)
+    if not record:
+        return jsonify({"ok": False, "error": "Job not found."}), 404
+    payload = jobs.serialize(record)
+    if jobs.has_result(record) and _can_download(record):
+        payload["download_url"] = url_for("admin_job_download", job_id=job_id)
+    return jsonify({"ok": True, "job": payload})
+
+
+def _can_download(record):
+    """One-time results hold generated passwords; only the admin who started the job gets them."""
+    return not record.one_time_result or record.created_by == session.get("user_id")
+
+
+@app.route("/admin/jobs/<int:job_id>/download")
+def admin_job_download(job_id):
+    if not is_logged_in() or session.get("role_id") != 1:
+        return redirect(url_for("login"))
+    back = request.referrer or url_for("admin_users")
+    record = BackgroundJob.query.get(job_id)
+    if not record:
+        flash("Job not found.", "danger")
+        return redirect(back)
+    if not _can_download(record):
+        flash(f"Only the admin who started job #{job_id} can download its result.", "danger")
+        return redirect(back)
+    if record.status in ("queued", "running"):
+        flash(f"Job #{job_id} is still {record.status} ({record.progress}/{record.total}). Try again shortly.", "info")
+        return redirect(back)
+    if record.status == "failed":
+        flash(f"Job #{job_id} failed: {record.message}", "danger")
+        return redirect(back)
+    if not jobs.has_result(record):
+        flash(f"Job #{job_id} has no downloadable result (it may already have been downloaded, or expired).", "info")
+        return redirect(back)
+
+    data = io.BytesIO(record.result.encode('utf-8'))
+    if record.one_time_result:
+        # Same one-time visibility as the session credential list
+        record.result = None
+        db.session.commit()
+    if record.message:
+        flash(record.message, "success")
+    return send_file(data, as_attachment=True, download_name=record.result_filename or f"job_{job_id}.txt",
+                     mimetype=record.result_mimetype or 'text/plain')
+
+
+@app.route("/admin/pool_stats")
+def admin_pool_stats():
+    """Connection pool occupancy and checkout wait times, for sizing DB_POOL_*."""
+    if not is_logged_in() or session.get("role_id") != 1:
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(pool_stats(db.engine))
+
+
+@app.route("/admin/perf")
+def admin_perf():
+    """Per-endpoint latency percentiles, query counts and slowest statements."""
+    if not is_logged_in() or session.get("role_id") != 1:
+        return redirect(url_for("login"))
+    endpoints = perf.endpoint_report()
+    if request.args.get("format") == "json":
+        return jsonify(endpoints)
+    return render_template("admin/perf.html", endpoints=endpoints, pool=pool_stats(db.engine))
+
+
 # Minimal Roles CRUD JSON endpoints
 @app.route('/admin/roles', methods=['GET'])
 def roles_list():
@@ -1354,56 +1433,26 @@ def roles_list():
         roles = [{"role_id": r.role_id, "role_name": r.role_name} for r in Role.query.order_by(Role.role_id).all()]
     return jsonify(roles)
 
-@app.route("/admin/admin_total_students")
-def admin_total_students():
-
-    # ======================
-    # PAGINATION INPUT
-    # ======================
-    page = request.args.get("page", 1, type=int)
-    per_page = request.args.get("per_page", 10, type=int)
-    offset = (page - 1) * per_page
-
-    # ======================
-    # BASIC COUNTS
-    # ======================
-    total_students = db.session.execute(db.text("""
-        SELECT COUNT(*) 
-        FROM users u
-        JOIN students s ON u.user_id = s.users_user_id
-        WHERE u.role_id = 3
-    """)).scalar()
+STUDENT_OVERVIEW_TTL = 60  # seconds; student writes invalidate "students:" right away
 
-    total_male_students = db.session.execute(db.text("""
-        SELECT COUNT(*) 
-        FROM users u
-        JOIN students s ON u.user_id = s.users_user_id
-        WHERE u.gender = 'Male' AND u.role_id = 3
-    """)).scalar()
 
-    total_female_students = db.session.execute(db.text("""
-        SELECT COUNT(*) 
-        FROM users u
-        JOIN students s ON u.user_id = s.users_user_id
-        WHERE u.gender = 'Female' AND u.role_id = 3
-    """)).scalar()
-
-    # ======================
-    # NEW STUDENTS THIS MONTH
-    # ======================
-    new_students_month = db.session.execute(db.text("""
-        SELECT COUNT(*) 
+def _student_overview():
+    """Student KPIs (one conditional-aggregation query) plus the class and trend charts."""
+    row = db.session.execute(db.text("""
+        SELECT
+            COUNT(*) AS total_students,
+            COALESCE(SUM(u.gender = 'Male'), 0) AS total_male_students,
+            COALESCE(SUM(u.gender = 'Female'), 0) AS total_female_students,
+            COALESCE(SUM(u.created_at IS NOT NULL
+                AND MONTH(u.created_at) = MONTH(CURRENT_DATE())
+                AND YEAR(u.created_at) = YEAR(CURRENT_DATE())), 0) AS new_students_month,
+            COALESCE(SUM(u.is_active = 1), 0) AS active_students,
+            COALESCE(SUM(u.is_active = 0), 0) AS inactive_students
         FROM users u
         JOIN students s ON u.user_id = s.users_user_id
         WHERE u.role_id = 3
-        AND u.created_at IS NOT NULL
-        AND MONTH(u.created_at) = MONTH(CURRENT_DATE())
-        AND YEAR(u.created_at) = YEAR(CURRENT_DATE())
-    """)).scalar() or 0
+    """)).mappings().first()
 
-    # ======================
-    # CLASS STATS
-    # ======================
     class_rows = db.session.execute(db.text("""
         SELECT class_id, COUNT(*) 
         FROM students
@@ -1411,15 +1460,6 @@ def admin_total_students():
         ORDER BY class_id
     """)).fetchall()
 
-    class_labels = [str(row[0]) for row in class_rows]
-    class_values = [row[1] for row in class_rows]
-
-    total_classes = len(class_labels)
-    avg_students_per_class = round(sum(class_values) / total_classes, 1) if total_classes > 0 else 0
-
-    # ======================
-    # TREND CHART
-    # ======================
     trend_rows = db.session.execute(db.text("""
         SELECT 
             MONTH(u.created_at) AS month, 
@@ -1434,63 +1474,67 @@ def admin_total_students():
     """)).fetchall()
 
     month_names = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
-    trend_labels = [f"{month_names[row[0]-1]} {row[1]}" for row in trend_rows]
-    trend_values = [row[2] for row in trend_rows]
+    return {
+        "kpis": {k: int(v or 0) for k, v in row.items()},
+        "class_labels": [str(r[0]) for r in class_rows],
+        "class_values": [r[1] for r in class_rows],
+        "trend_labels": [f"{month_names[r[0]-1]} {r[1]}" for r in trend_rows],
+        "trend_values": [r[2] for r in trend_rows],
+    }
 
-    # ======================
-    # PASS / FAIL PLACEHOLDER
-    # ======================
-    pass_rate = 0
-    fail_rate = 0
+
+@app.route("/admin/admin_total_students")
+def admin_total_students():
 
     # ======================
-    # ACTIVE / INACTIVE
+    # KPIS + CHARTS (cached, see _student_overview)
     # ======================
-    active_students = db.session.execute(db.text("""
-        SELECT COUNT(*) 
-        FROM users u
-        JOIN students s ON u.user_id = s.users_user_id
-        WHERE u.is_active = 1 AND u.role_id = 3
-    """)).scalar()
+    overview = cache.cached("students:overview", _student_overview, ttl=STUDENT_OVERVIEW_TTL)
+    kpis = overview["kpis"]
 
-    inactive_students = db.session.execute(db.text("""
-        SELECT COUNT(*) 
-        FROM users u
-        JOIN students s ON u.user_id = s.users_user_id
-        WHERE u.is_active = 0 AND u.role_id = 3
-    """)).scalar()
+    class_labels = overview["class_labels"]
+    class_values = overview["class_values"]
+
+    total_classes = len(class_labels)
+    avg_students_per_class = round(sum(class_values) / total_classes, 1) if total_classes > 0 else 0
+
+    trend_labels = overview["trend_labels"]
+    trend_values = overview["trend_values"]
 
     # ======================
-    # TOTAL STUDENT RECORDS (for pagination)
+    # PASS / FAIL PLACEHOLDER
     # ======================
-    total_records = db.session.execute(db.text("""
-        SELECT COUNT(*)
-        FROM users u
-        JOIN students s ON u.user_id = s.users_user_id
-        WHERE u.role_id = 3
-    """)).scalar()
+    pass_rate = 0
+    fail_rate = 0
 
     # ======================
     # FETCH PAGINATED STUDENT ROWS (WITH CLASS NAME)
     # ======================
-    student_rows = db.session.execute(db.text("""
-        SELECT 
-            u.user_id, 
-            u.full_name, 
-            u.gender, 
-            u.email,
-            u.phone, 
-            s.student_id, 
-            s.class_id,
-            c.class_name,
-            u.is_active
-        FROM users u
-        JOIN students s ON u.user_id = s.users_user_id
-        LEFT JOIN classes c ON s.class_id = c.class_id
-        WHERE u.role_id = 3
-        ORDER BY s.student_id ASC
-        LIMIT :limit OFFSET :offset
-    """), {"limit": per_page, "offset": offset}).fetchall()
+    def run_students(where_sql, order_sql, limit, offset, params):
+        return db.session.execute(db.text(f"""
+            SELECT 
+                u.user_id, 
+                u.full_name, 
+                u.gender, 
+                u.email,
+                u.phone, 
+                s.student_id, 
+                s.class_id,
+                c.class_name,
+                u.is_active
+            FROM users u
+            JOIN students s ON u.user_id = s.users_user_id
+            LEFT JOIN classes c ON s.class_id = c.class_id
+            WHERE u.role_id = 3 AND {where_sql}
+            ORDER BY {order_sql}
+            LIMIT :limit OFFSET :offset
+        """), dict(params, limit=limit, offset=offset)).fetchall()
+
+    # Total comes from the cached KPI query above
+    students_pagination = paginate(
+        run_students, [("s.student_id", "asc")], lambda r: [r.student_id],
+        PageRequest.from_args(request.args), kpis["total_students"],
+    )
 
     students = [{
         "user_id": r[0],
@@ -1502,7 +1546,7 @@ def admin_total_students():
         "class_id": r[6],
         "class_name": r[7],
         "is_active": r[8],
-    } for r in student_rows]
+    } for r in students_pagination.items]
 
     # ======================
     # GET AVAILABLE CLASSES
@@ -1527,21 +1571,6 @@ def admin_total_students():
         .all()
     )
 
-    # ======================
-    # PAGINATION OBJECT
-    # ======================
-    class Pagination:
-        def __init__(self, page, per_page, total):
-            self.page = page
-            self.per_page = per_page
-            self.total = total
-            self.pages = (total + per_page - 1) // per_page
-            self.has_prev = page > 1
-            self.has_next = page < self.pages
-            self.prev_num = page - 1
-            self.next_num = page + 1
-
-    students_pagination = Pagination(page, per_page, total_records)
 # ======================
 # RENDER TEMPLATE
 # ======================
@@ -1550,10 +1579,10 @@ def admin_total_students():
     return render_template(
         "admin/admin_total_students.html",
 
-        total_students=total_students,
-        total_male_students=total_male_students,
-        total_female_students=total_female_students,
-        new_students_month=new_students_month,
+        total_students=kpis["total_students"],
+        total_male_students=kpis["total_male_students"],
+        total_female_students=kpis["total_female_students"],
+        new_students_month=kpis["new_students_month"],
 
         total_classes=total_classes,
         avg_students_per_class=avg_students_per_class,
@@ -1561,8 +1590,8 @@ def admin_total_students():
         pass_rate=pass_rate,
         fail_rate=fail_rate,
 
-        active_students=active_students,
-        inactive_students=inactive_students,
+        active_students=kpis["active_students"],
+        inactive_students=kpis["inactive_students"],
 
         students=students,
         students_pagination=students_pagination,
@@ -1612,6 +1641,7 @@ def total_add_students():
     )
     db.session.add(new_student)
     db.session.commit()
+    cache.invalidate("students:")
     log_activity(session["user_id"], f"Created student {full_name}")
 
     return redirect(url_for("admin_total_students"))
@@ -1652,6 +1682,8 @@ def admin_edit_total_student(user_id):
         })
 
         db.session.commit()
+        cache.invalidate("students:")
+        profiles.invalidate(user_id)
         flash("Student updated successfully!", "success")
 
     except Exception as e:
@@ -1673,6 +1705,7 @@ def admin_student_toggle_status(user_id):
 
     user.is_active = 0 if user.is_active else 1
     db.session.commit()
+    cache.invalidate("students:")
 
     flash("Student status updated!", "success")
     status = "Activated" if user.is_active else "Deactivated"
@@ -1699,46 +1732,10 @@ def admin_import_students():
         flash('Only CSV files are supported.', 'warning')
         return redirect(url_for('admin_total_students'))
 
-    stream = io.TextIOWrapper(file.stream, encoding='utf-8')
-    reader = csv.DictReader(stream)
-    created = 0
-
-    with app.app_context():
-        for row in reader:
-            full_name = (row.get('full_name') or row.get('name') or 'New User').strip()
-            email = (row.get('email') or '').strip() or None
-            phone = (row.get('phone') or '').strip() or None
-            class_id = (row.get('class_id') or '').strip()
-
-            username = _generate_username(full_name.split()[0])
-            temp_pw = _generate_password()
-
-            user = User(
-                username=username,
-                password=generate_password_hash(temp_pw),
-                full_name=full_name,
-                email=email,
-                phone=phone,
-                role_id=3,  # student
-                is_active=1,
-                force_password_change=1
-            )
-            db.session.add(user)
-            db.session.flush()
-
-            student = Student(
-                class_id=int(class_id) if class_id else None,
-                users_user_id=user.user_id
-            )
-            db.session.add(student)
-
-            _add_credential(username, temp_pw, full_name, email or "")
-            created += 1
-
-        db.session.commit()
-
-    flash(f"Successfully imported {created} students.", 'success')
-    log_activity(session["user_id"], f"Imported {created} students from CSV")
+    csv_text = io.TextIOWrapper(file.stream, encoding='utf-8').read()
+    job_id = jobs.submit('import_users', session['user_id'], csv_text=csv_text, entity='student',
+                         actor_id=session['user_id'], log_as="students")
+    _flash_job_queued(job_id, "The student import")
 
     return redirect(url_for('admin_total_students'))
 
@@ -1802,6 +1799,9 @@ def admin_edit_total_teacher(user_id):
                 })
 
         db.session.commit()
+        cache.invalidate("teachers:")
+        profiles.invalidate(user_id)
+        reference.bump()
         flash("Teacher updated successfully!", "success")
 
     except Exception as e:
@@ -1868,6 +1868,8 @@ def total_add_teacher():
             """), {"cid": cid, "tid": teacher_id})
 
         db.session.commit()
+        cache.invalidate("teachers:")
+        reference.bump()
 
         _add_credential(username, temp_pw, full_name, email or "")
 
@@ -1881,44 +1883,21 @@ def total_add_teacher():
 
     return redirect(url_for("admin_total_teachers"))
 
-@app.route("/admin/admin_total_teachers")
-def admin_total_teachers():
-    if not is_logged_in() or session.get("role_id") != 1:
-        return redirect(url_for("login"))
+TEACHER_OVERVIEW_TTL = 60  # seconds; teacher writes invalidate "teachers:" right away
 
-    # Pagination
-    page = request.args.get("page", 1, type=int)
-    per_page = request.args.get("per_page", 10, type=int)
-    offset = (page - 1) * per_page
 
-    # ---- KPI COUNTS ----
-    total_teachers = db.session.execute(db.text("""
-        SELECT COUNT(*)
+def _teacher_overview():
+    """Teacher KPIs (one conditional-aggregation query) plus the subject and grade charts."""
+    row = db.session.execute(db.text("""
+        SELECT
+            COUNT(*) AS total_teachers,
+            COALESCE(SUM(u.gender = 'Male'), 0) AS male_teachers,
+            COALESCE(SUM(u.gender = 'Female'), 0) AS female_teachers,
+            COALESCE(SUM(u.is_active = 1), 0) AS active_teachers
         FROM users u
         JOIN teachers t ON u.user_id = t.users_user_id
         WHERE u.role_id = 2
-    """)).scalar()
-
-    male_teachers = db.session.execute(db.text("""
-        SELECT COUNT(*)
-        FROM users u
-        JOIN teachers t ON u.user_id = t.users_user_id
-        WHERE u.gender = 'Male' AND u.role_id = 2
-    """)).scalar()
-
-    female_teachers = db.session.execute(db.text("""
-        SELECT COUNT(*)
-        FROM users u
-        JOIN teachers t ON u.user_id = t.users_user_id
-        WHERE u.gender = 'Female' AND u.role_id = 2
-    """)).scalar()
-
-    active_teachers = db.session.execute(db.text("""
-        SELECT COUNT(*)
-        FROM users u
-        JOIN teachers t ON u.user_id = t.users_user_id
-        WHERE u.is_active = 1 AND u.role_id = 2
-    """)).scalar()
+    """)).mappings().first()
 
     # ---- TEACHERS PER SUBJECT (CHART) ----
     dept_rows = db.session.execute(db.text("""
@@ -1928,9 +1907,6 @@ def admin_total_teachers():
         GROUP BY s.subject_name
     """)).fetchall()
 
-    department_labels = [r[0] or "Unassigned" for r in dept_rows]
-    department_values = [r[1] for r in dept_rows]
-
     # ---- TEACHERS PER GRADE LEVEL (CHART) ----
     grade_rows = db.session.execute(db.text("""
         SELECT c.grade_level, COUNT(*)
@@ -1939,40 +1915,70 @@ def admin_total_teachers():
         GROUP BY c.grade_level
     """)).fetchall()
 
-    grade_level_labels = [str(r[0]) for r in grade_rows]
-    grade_level_values = [r[1] for r in grade_rows]
-
-    # ---- PAGINATED TABLE QUERY (NO MORE ONLY_FULL_GROUP_BY ERROR) ----
-    teacher_rows = db.session.execute(db.text("""
-        SELECT
-            t.teacher_id,
+    return {
+        "kpis": {k: int(v or 0) for k, v in row.items()},
+        "department_labels": [r[0] or "Unassigned" for r in dept_rows],
+        "department_values": [r[1] for r in dept_rows],
+        "grade_level_labels": [str(r[0]) for r in grade_rows],
+        "grade_level_values": [r[1] for r in grade_rows],
+    }
 
-            MAX(u.user_id)        AS user_id,
-            MAX(u.full_name)      AS full_name,
-            MAX(u.gender)         AS gender,
-            MAX(u.email)          AS email,
-            MAX(u.phone)          AS phone,
-            MAX(u.is_active)      AS is_active,
-            MAX(s.subject_name)   AS subject_name,
 
-            GROUP_CONCAT(c.class_name ORDER BY c.class_name SEPARATOR ',') AS class_names,
-            GROUP_CONCAT(c.class_id   ORDER BY c.class_id   SEPARATOR ',') AS class_ids
+@app.route("/admin/admin_total_teachers")
+def admin_total_teachers():
+    if not is_logged_in() or session.get("role_id") != 1:
+        return redirect(url_for("login"))
 
-        FROM teachers t
-        JOIN users u ON u.user_id = t.users_user_id
-        LEFT JOIN subjects s ON s.subject_id = t.subject_id
-        LEFT JOIN classes_has_teachers cht ON cht.teachers_teacher_id = t.teacher_id
-        LEFT JOIN classes c ON c.class_id = cht.classes_class_id
+    # ---- KPIS + CHARTS (cached, see _teacher_overview) ----
+    overview = cache.cached("teachers:overview", _teacher_overview, ttl=TEACHER_OVERVIEW_TTL)
+    kpis = overview["kpis"]
 
-        WHERE u.role_id = 2
-        GROUP BY t.teacher_id
-        ORDER BY t.teacher_id ASC
-        LIMIT :limit OFFSET :offset
-    """), {"limit": per_page, "offset": offset}).fetchall()
+    # ---- PAGINATED TABLE QUERY ----
+    # The derived table picks the page's teacher ids first so GROUP_CONCAT
+    # only runs over those rows, not over every teacher
+    def run_teachers(where_sql, order_sql, limit, offset, params):
+        return db.session.execute(db.text(f"""
+            SELECT
+                t.teacher_id,
+
+                MAX(u.user_id)        AS user_id,
+                MAX(u.full_name)      AS full_name,
+                MAX(u.gender)         AS gender,
+                MAX(u.email)          AS email,
+                MAX(u.phone)          AS phone,
+                MAX(u.is_active)      AS is_active,
+                MAX(s.subject_name)   AS subject_name,
+
+                GROUP_CONCAT(c.class_name ORDER BY c.class_name SEPARATOR ',') AS class_names,
+                GROUP_CONCAT(c.class_id   ORDER BY c.class_id   SEPARATOR ',') AS class_ids
+
+            FROM (
+                SELECT t.teacher_id
+                FROM teachers t
+                JOIN users u ON u.user_id = t.users_user_id
+                WHERE u.role_id = 2 AND {where_sql}
+                ORDER BY {order_sql}
+                LIMIT :limit OFFSET :offset
+            ) page_ids
+            JOIN teachers t ON t.teacher_id = page_ids.teacher_id
+            JOIN users u ON u.user_id = t.users_user_id
+            LEFT JOIN subjects s ON s.subject_id = t.subject_id
+            LEFT JOIN classes_has_teachers cht ON cht.teachers_teacher_id = t.teacher_id
+            LEFT JOIN classes c ON c.class_id = cht.classes_class_id
+
+            GROUP BY t.teacher_id
+            ORDER BY {order_sql}
+        """), dict(params, limit=limit, offset=offset)).fetchall()
+
+    # Total comes from the cached KPI query above
+    teachers_pagination = paginate(
+        run_teachers, [("t.teacher_id", "asc")], lambda r: [r.teacher_id],
+        PageRequest.from_args(request.args), kpis["total_teachers"],
+    )
 
     # ---- Convert SQL rows to Python dictionaries ----
     teachers = []
-    for r in teacher_rows:
+    for r in teachers_pagination.items:
         teachers.append({
             "teacher_id": r.teacher_id,
             "user_id": r.user_id,
@@ -1988,20 +1994,6 @@ def admin_total_teachers():
             "class_ids": [int(x) for x in r.class_ids.split(",")] if r.class_ids else []
         })
 
-    # ---- Pagination helper ----
-    class Pagination:
-        def __init__(self, page, per_page, total):
-            self.page = page
-            self.per_page = per_page
-            self.total = total
-            self.pages = (total + per_page - 1) // per_page
-            self.has_prev = page > 1
-            self.has_next = page < self.pages
-            self.prev_num = page - 1
-            self.next_num = page + 1
-
-    teachers_pagination = Pagination(page, per_page, total_teachers)
-
     # Dropdown data
     subjects = Subject.query.all()
     classes = Class.query.all()
@@ -2014,16 +2006,16 @@ def admin_total_teachers():
         teachers_pagination=teachers_pagination,
 
         # KPI
-        total_teachers=total_teachers,
-        male_teachers=male_teachers,
-        female_teachers=female_teachers,
-        active_teachers=active_teachers,
+        total_teachers=kpis["total_teachers"],
+        male_teachers=kpis["male_teachers"],
+        female_teachers=kpis["female_teachers"],
+        active_teachers=kpis["active_teachers"],
 
         # charts
-        department_labels=department_labels,
-        department_values=department_values,
-        grade_level_labels=grade_level_labels,
-        grade_level_values=grade_level_values,
+        department_labels=overview["department_labels"],
+        department_values=overview["department_values"],
+        grade_level_labels=overview["grade_level_labels"],
+        grade_level_values=overview["grade_level_values"],
 
         # form dropdowns
         subjects=subjects,
@@ -2067,6 +2059,9 @@ def admin_edit_teacher_post(user_id):
                 """), {"cid": cid, "tid": teacher.teacher_id})
 
         db.session.commit()
+        cache.invalidate("teachers:")
+        profiles.invalidate(user_id)
+        reference.bump()
         flash("Teacher updated successfully!", "success")
 
     except Exception as e:
@@ -2091,6 +2086,8 @@ def admin_toggle_teacher_status(teacher_id):
     # Toggle active/inactive
     user.is_active = 0 if user.is_active else 1
     db.session.commit()
+    cache.invalidate("teachers:")
+    reference.bump()
 
     flash("Teacher status updated successfully!", "success")
     status = "Activated" if user.is_active else "Deactivated"
@@ -2136,6 +2133,8 @@ def admin_create_teacher():
     if subject:
         new_teacher.subject_id = subject.subject_id
         db.session.commit()
+    cache.invalidate("teachers:")
+    reference.bump()
 
     _add_credential(username, temp_pw, full_name, email or "")
     flash("Teacher created successfully.", "success")
@@ -2158,66 +2157,11 @@ def admin_import_teachers():
         flash('Only CSV files are supported.', 'warning')
         return redirect(url_for('admin_total_teachers'))
 
-    stream = io.TextIOWrapper(file.stream, encoding='utf-8')
-    reader = csv.DictReader(stream)
-    created = 0
-
-    with app.app_context():
-        for row in reader:
-            full_name = (row.get('full_name') or row.get('name') or 'New Teacher').strip()
-            email = (row.get('email') or '').strip() or None
-            phone = (row.get('phone') or '').strip() or None
-            subject_name = (row.get('subject') or '').strip()
-            class_name = (row.get('class') or '').strip()
-
-            # Convert subject name → subject_id
-            subject = Subject.query.filter_by(subject_name=subject_name).first()
-            subject_id = subject.subject_id if subject else None
-
-            # Convert class name → class_id
-            class_obj = Class.query.filter_by(class_name=class_name).first()
-            class_id = class_obj.class_id if class_obj else None
-
-            username = _generate_username(full_name.split()[0])
-            temp_pw = _generate_password()
-
-            # Create User
-            user = User(
-                username=username,
-                password=generate_password_hash(temp_pw),
-                full_name=full_name,
-                email=email,
-                phone=phone,
-                gender="N/A",
-                role_id=2,
-                is_active=1,
-                force_password_change=1
-            )
-            db.session.add(user)
-            db.session.flush()
-
-            # Create Teacher
-            teacher = Teacher(
-                users_user_id=user.user_id,
-                subject_id=subject_id
-            )
-            db.session.add(teacher)
-            db.session.flush()
-
-            # Assign class if provided
-            if class_id:
-                db.session.execute(db.text("""
-                    INSERT INTO classes_has_teachers (classes_class_id, teachers_teacher_id)
-                    VALUES (:cid, :tid)
-                """), { "cid": class_id, "tid": teacher.teacher_id })
-
-            _add_credential(username, temp_pw, full_name, email or "")
-            created += 1
-
-        db.session.commit()
-
-    flash(f"Successfully imported {created} teachers.", 'success')
-    log_activity(session["user_id"], f"Imported {created} teachers from CSV")
+    csv_text = io.TextIOWrapper(file.stream, encoding='utf-8').read()
+    # Subject and class columns hold names here; they are resolved in one query
+    job_id = jobs.submit('import_users', session['user_id'], csv_text=csv_text, entity='teacher',
+                         actor_id=session['user_id'], log_as="teachers", by_name=True, gender="N/A", default_name='New Teacher')
+    _flash_job_queued(job_id, "The teacher import")
 
     return redirect(url_for('admin_total_teachers'))
 
@@ -2250,196 +2194,64 @@ def roles_delete(role_id):
 @app.route("/teacher")
 def teacher_dashboard():
     if not is_logged_in() or session.get("role_id") != 2:
-        return redirect(url_for("login"))
-    # Use the existing teacher dashboard template
-    return render_template("teacher/dashboard.html", active_page="dashboard")
-
-
-@app.route("/teacher/dashboard/data")
-def teacher_dashboard_data():
-    """Provide dashboard stats for the logged-in teacher."""
-    if not is_logged_in() or session.get("role_id") != 2:
-        return jsonify({"ok": False, "error": "Unauthorized"}), 401
-
-    user_id = session.get("user_id")
-    teacher_row = db.session.execute(db.text(
-        """
-        SELECT teacher_id
-        FROM teachers
-        WHERE users_user_id = :uid
-        """
-    ), {"uid": user_id}).fetchone()
-
-    if not teacher_row:
-        return jsonify({"ok": False, "error": "Teacher profile not found."}), 404
-
-    teacher_id = teacher_row.teacher_id
-
-    # Classes the teacher handles
-    class_rows = db.session.execute(db.text(
-        """
-        SELECT c.class_id, c.class_name, c.grade_level
-        FROM classes c
-        JOIN classes_has_teachers cht ON cht.classes_class_id = c.class_id
-        WHERE cht.teachers_teacher_id = :tid AND c.is_active = 1
-        ORDER BY c.grade_level, c.class_name
-        """
-    ), {"tid": teacher_id}).fetchall()
-
-    total_classes = len(class_rows)
+        return redirect(url_for("login"))
+    # Use the existing teacher dashboard template
+    return render_template("teacher/dashboard.html", active_page="dashboard")
 
-    # Summary counts
-    student_count_row = db.session.execute(db.text(
-        """
-        SELECT COUNT(DISTINCT s.student_id) AS total_students
-        FROM students s
-        JOIN classes_has_teachers cht ON cht.classes_class_id = s.class_id
-        WHERE cht.teachers_teacher_id = :tid
-        """
-    ), {"tid": teacher_id}).fetchone()
-    total_students = student_count_row.total_students if student_count_row else 0
 
-    totals_row = db.session.execute(db.text(
-        """
-        SELECT
-            (SELECT COUNT(*) FROM quizzes q WHERE q.teacher_id = :tid) AS total_tests,
-            (SELECT COUNT(*) FROM test_results tr WHERE tr.teacher_id = :tid) AS total_results
-        """
-    ), {"tid": teacher_id}).fetchone()
+CONDITIONAL_WINDOW_SECONDS = 60  # NOW()-based fields (upcoming / next test) refresh at least this often
 
-    total_tests = totals_row.total_tests if totals_row else 0
-    total_results = totals_row.total_results if totals_row else 0
 
-    # Upcoming tests (future start times)
-    upcoming = db.session.execute(db.text(
-        """
+def _teacher_data_version(teacher_id):
+    """
+    Cheap stand-in for everything the teacher JSON endpoints aggregate: the
+    teacher's results and quizzes (count, newest id, content versions), plus
+    the reference data version for class assignments and names.
+    """
+    row = db.session.execute(db.text("""
         SELECT
-            q.quiz_id,
-            q.title,
-            q.start_time,
-            q.end_time,
-            c.class_name,
-            s.subject_name
-        FROM quizzes q
-        JOIN classes c ON c.class_id = q.class_id
-        JOIN subjects s ON s.subject_id = q.subject_id
-        WHERE q.teacher_id = :tid
-          AND q.is_active = 1
-          AND q.start_time >= NOW()
-        ORDER BY q.start_time ASC
-        LIMIT 5
-        """
-    ), {"tid": teacher_id}).fetchall()
+            (SELECT COUNT(*) FROM test_results WHERE teacher_id = :tid) AS result_count,
+            (SELECT MAX(result_id) FROM test_results WHERE teacher_id = :tid) AS max_result_id,
+            (SELECT MAX(test_date) FROM test_results WHERE teacher_id = :tid) AS last_test_date,
+            (SELECT COUNT(*) FROM quizzes WHERE teacher_id = :tid) AS quiz_count,
+            (SELECT MAX(quiz_id) FROM quizzes WHERE teacher_id = :tid) AS max_quiz_id,
+            (
+                SELECT COALESCE(SUM(v.version), 0)
+                FROM quizzes q
+                JOIN quiz_content_versions v ON v.quiz_id = q.quiz_id
+                WHERE q.teacher_id = :tid
+            ) AS quiz_versions
+    """), {"tid": teacher_id}).fetchone()
+    return row, reference.get().etag
 
-    upcoming_tests = [
-        {
-            "quiz_id": r.quiz_id,
-            "title": r.title,
-            "class_name": r.class_name,
-            "subject_name": r.subject_name,
-            "start_time": r.start_time.isoformat() if r.start_time else None,
-            "end_time": r.end_time.isoformat() if r.end_time else None,
-        }
-        for r in upcoming
-    ]
 
-    # Recent test results (latest submissions)
-    recent_rows = db.session.execute(db.text(
-        """
-        SELECT
-            tr.result_id,
-            tr.test_date,
-            tr.quiz_score,
-            tr.grade,
-            u.full_name AS student_name,
-            c.class_name,
-            s.subject_name
-        FROM test_results tr
-        JOIN students st ON st.student_id = tr.student_id
-        JOIN users u ON u.user_id = st.users_user_id
-        JOIN classes c ON c.class_id = tr.class_id
-        JOIN subjects s ON s.subject_id = tr.subject_id
-        WHERE tr.teacher_id = :tid
-        ORDER BY tr.test_date DESC
-        LIMIT 5
-        """
-    ), {"tid": teacher_id}).fetchall()
-
-    recent_results = []
-    for r in recent_rows:
-        grade_val = r.grade if r.grade is not None else r.quiz_score
-        recent_results.append({
-            "result_id": r.result_id,
-            "student_name": r.student_name,
-            "class_name": r.class_name,
-            "subject_name": r.subject_name,
-            "score": float(r.quiz_score) if r.quiz_score is not None else None,
-            "grade": float(grade_val) if isinstance(grade_val, (int, float)) else grade_val,
-            "test_date": r.test_date.isoformat() if r.test_date else None,
-        })
+@app.route("/teacher/dashboard/data")
+def teacher_dashboard_data():
+    """Provide dashboard stats for the logged-in teacher."""
+    if not is_logged_in() or session.get("role_id") != 2:
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
 
-    # Pass / fail by class for chart
-    pass_fail_rows = db.session.execute(db.text(
-        """
-        SELECT
-            c.class_name,
-            SUM(CASE WHEN tr.quiz_score >= 60 THEN 1 ELSE 0 END) AS pass_count,
-            SUM(CASE WHEN tr.quiz_score < 60 THEN 1 ELSE 0 END) AS fail_count
-        FROM classes c
-        JOIN classes_has_teachers cht ON cht.classes_class_id = c.class_id
-        LEFT JOIN test_results tr ON tr.class_id = c.class_id AND tr.teacher_id = :tid
-        WHERE cht.teachers_teacher_id = :tid AND c.is_active = 1
-        GROUP BY c.class_id, c.class_name
-        ORDER BY c.grade_level, c.class_name
-        """
-    ), {"tid": teacher_id}).fetchall()
+    user_id = session.get("user_id")
+    teacher_row = profiles.teacher(user_id)
 
-    pass_fail = [
-        {
-            "class_name": r.class_name,
-            "pass_count": int(r.pass_count or 0),
-            "fail_count": int(r.fail_count or 0),
-        }
-        for r in pass_fail_rows
-    ]
+    if not teacher_row:
+        return jsonify({"ok": False, "error": "Teacher profile not found."}), 404
 
-    # Tests distribution by grade level
-    tests_by_grade_rows = db.session.execute(db.text(
-        """
-        SELECT
-            c.grade_level,
-            COUNT(q.quiz_id) AS test_count
-        FROM classes c
-        JOIN classes_has_teachers cht ON cht.classes_class_id = c.class_id
-        LEFT JOIN quizzes q ON q.class_id = c.class_id AND q.teacher_id = :tid
-        WHERE cht.teachers_teacher_id = :tid AND c.is_active = 1
-        GROUP BY c.grade_level
-        ORDER BY c.grade_level
-        """
-    ), {"tid": teacher_id}).fetchall()
+    teacher_id = teacher_row.teacher_id
 
-    tests_by_grade = [
-        {
-            "grade_level": r.grade_level,
-            "test_count": int(r.test_count or 0),
-        }
-        for r in tests_by_grade_rows
-    ]
+    version, ref_etag = _teacher_data_version(teacher_id)
+    etag = conditional.make_etag(
+        "teacher-dashboard", teacher_id, tuple(version), ref_etag,
+        int(time.time() // CONDITIONAL_WINDOW_SECONDS),
+    )
+    cached = conditional.not_modified(etag)
+    if cached:
+        return cached
 
-    payload = {
-        "summary": {
-            "total_students": int(total_students or 0),
-            "total_classes": int(total_classes or 0),
-            "total_tests": int(total_tests or 0),
-            "total_results": int(total_results or 0),
-        },
-        "upcoming_tests": upcoming_tests,
-        "recent_results": recent_results,
-        "pass_fail": pass_fail,
-        "tests_by_grade": tests_by_grade,
-    }
+    # Totals come from the version query; the rest is one class-scope CTE plus two lists
+    payload = teacher_stats.payload(teacher_id, etag, version.quiz_count, version.result_count)
 
-    return jsonify({"ok": True, "data": payload})
+    return conditional.tag(jsonify({"ok": True, "data": payload}), etag)
 
 
 @app.route("/teacher/students")
@@ -2447,11 +2259,7 @@ def teacher_students():
     if not is_logged_in() or session.get("role_id") != 2:
         return redirect(url_for("login"))
     user_id = session.get("user_id")
-    teacher_row = db.session.execute(db.text("""
-        SELECT teacher_id
-        FROM teachers
-        WHERE users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    teacher_row = profiles.teacher(user_id)
 
     if not teacher_row:
         flash("Teacher profile not found. Please contact the administrator to link your teacher profile.", "danger")
@@ -2492,7 +2300,84 @@ def teacher_students():
 def teacher_report():
     if not is_logged_in() or session.get("role_id") != 2:
         return redirect(url_for("login"))
-    return render_template("teacher/report.html", active_page="report")
+    teacher_row = profiles.teacher(session.get("user_id"))
+    ref = reference.get()
+    # Filter dropdowns: the teacher's classes and every active subject
+    classes = ref.classes_by_teacher.get(teacher_row.teacher_id, []) if teacher_row else []
+    return render_template(
+        "teacher/report.html",
+        classes=classes,
+        subjects=ref.active_subjects,
+        active_page="report"
+    )
+
+
+TEACHER_REPORT_PAGE_SIZE = 50
+
+# Shared by the page, total and export queries so they always count the same rows
+TEACHER_REPORT_FROM = """
+    FROM test_results tr
+    JOIN students s ON s.student_id = tr.student_id
+    JOIN users u ON u.user_id = s.users_user_id
+    JOIN subjects sub ON sub.subject_id = tr.subject_id
+    JOIN classes c ON c.class_id = tr.class_id
+"""
+
+# sort name -> keyset columns; each ends in result_id so the order is total.
+# COALESCE keeps NULL dates / names / scores inside the keyset comparisons.
+TEACHER_REPORT_SORTS = {
+    "date_desc": [("COALESCE(tr.test_date, '1970-01-01')", "desc"), ("tr.result_id", "desc")],
+    "date_asc": [("COALESCE(tr.test_date, '1970-01-01')", "asc"), ("tr.result_id", "asc")],
+    "name_asc": [("COALESCE(u.full_name, '')", "asc"), ("tr.result_id", "asc")],
+    "name_desc": [("COALESCE(u.full_name, '')", "desc"), ("tr.result_id", "desc")],
+    "grade_desc": [("COALESCE(tr.quiz_score, -1)", "desc"), ("tr.result_id", "desc")],
+    "grade_asc": [("COALESCE(tr.quiz_score, -1)", "asc"), ("tr.result_id", "asc")],
+}
+
+
+def _teacher_report_key(row, key_exprs):
+    values = {
+        "COALESCE(tr.test_date, '1970-01-01')": str(row.test_date) if row.test_date else "1970-01-01",
+        "COALESCE(u.full_name, '')": row.student_name or "",
+        "COALESCE(tr.quiz_score, -1)": float(row.quiz_score) if row.quiz_score is not None else -1,
+        "tr.result_id": row.result_id,
+    }
+    return [values[expr] for expr in key_exprs]
+
+
+def _teacher_report_filters(teacher_id, args):
+    """
+    WHERE clause for the teacher report from its query string: class_id,
+    subject_id, date_from / date_to (YYYY-MM-DD) and a student name prefix
+    (search), which ix_users_full_name can serve, unlike a '%term%' match.
+    """
+    conditions = ["tr.teacher_id = :tid"]
+    params = {"tid": teacher_id}
+
+    class_id = args.get("class_id", type=int)
+    if class_id:
+        conditions.append("tr.class_id = :class_id")
+        params["class_id"] = class_id
+    subject_id = args.get("subject_id", type=int)
+    if subject_id:
+        conditions.append("tr.subject_id = :subject_id")
+        params["subject_id"] = subject_id
+
+    for name, op, shift in (("date_from", ">=", 0), ("date_to", "<", 1)):
+        try:
+            day = datetime.strptime(args.get(name, ""), "%Y-%m-%d")
+        except ValueError:
+            continue
+        conditions.append(f"tr.test_date {op} :{name}")
+        params[name] = day + timedelta(days=shift)  # date_to includes the whole day
+
+    search = (args.get("search") or "").strip()
+    if search:
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("u.full_name LIKE :search")
+        params["search"] = escaped + "%"
+
+    return " AND ".join(conditions), params
 
 
 @app.route("/teacher/report/data")
@@ -2503,48 +2388,57 @@ def teacher_report_data():
             return jsonify({"ok": False, "error": "Unauthorized"}), 401
 
         user_id = session.get("user_id")
-        teacher_row = db.session.execute(db.text(
-            """
-            SELECT teacher_id
-            FROM teachers
-            WHERE users_user_id = :uid
-            """
-        ), {"uid": user_id}).fetchone()
+        teacher_row = profiles.teacher(user_id)
 
         if not teacher_row:
             return jsonify({"ok": False, "error": "Teacher profile not found."}), 404
 
-        search = (request.args.get("search") or "").strip().lower()
-
-        query = """
-            SELECT
-                tr.result_id,
-                tr.test_date,
-                tr.quiz_score,
-                tr.grade,
-                sub.subject_name,
-                c.class_name,
-                u.full_name AS student_name
-            FROM test_results tr
-            JOIN students s ON s.student_id = tr.student_id
-            JOIN users u ON u.user_id = s.users_user_id
-            JOIN subjects sub ON sub.subject_id = tr.subject_id
-            JOIN classes c ON c.class_id = tr.class_id
-            WHERE tr.teacher_id = :tid
-        """
-
-        params = {"tid": teacher_row.teacher_id}
-
-        if search:
-            query += " AND LOWER(u.full_name) LIKE :search"
-            params["search"] = f"%{search}%"
-
-        query += " ORDER BY tr.test_date DESC, u.full_name"
+        version, ref_etag = _teacher_data_version(teacher_row.teacher_id)
+        # The query string carries the filters, sort, page size and cursor: each page gets its own validator
+        etag = conditional.make_etag("teacher-report", teacher_row.teacher_id, tuple(version), ref_etag,
+                                     request.query_string)
+        last_modified = version.last_test_date if isinstance(version.last_test_date, datetime) else None
+        cached = conditional.not_modified(etag, last_modified)
+        if cached:
+            return cached
+
+        where_sql, params = _teacher_report_filters(teacher_row.teacher_id, request.args)
+        keys = TEACHER_REPORT_SORTS.get(request.args.get("sort"), TEACHER_REPORT_SORTS["date_desc"])
+        req = PageRequest(
+            per_page=request.args.get("per_page", TEACHER_REPORT_PAGE_SIZE, type=int),
+            after=request.args.get("after"),
+        )
 
-        rows = db.session.execute(db.text(query), params).fetchall()
+        def run_results(keyset_sql, order_sql, limit, offset, keyset_params):
+            return db.session.execute(db.text(f"""
+                SELECT
+                    tr.result_id,
+                    tr.test_date,
+                    tr.quiz_score,
+                    tr.grade,
+                    sub.subject_name,
+                    c.class_name,
+                    u.full_name AS student_name
+                {TEACHER_REPORT_FROM}
+                WHERE {where_sql} AND {keyset_sql}
+                ORDER BY {order_sql}
+                LIMIT :limit OFFSET :offset
+            """), {**params, **keyset_params, "limit": limit, "offset": offset}).fetchall()
+
+        # The total is only counted for the first page; later pages just append
+        total = None
+        if req.after is None:
+            total = db.session.execute(db.text(f"""
+                SELECT COUNT(*)
+                {TEACHER_REPORT_FROM}
+                WHERE {where_sql}
+            """), params).scalar()
+
+        key_exprs = [expr for expr, _ in keys]
+        page = paginate(run_results, keys, lambda r: _teacher_report_key(r, key_exprs), req, total)
 
         results = []
-        for r in rows:
+        for r in page.items:
             # Grade may be a letter (generated column) or numeric; avoid forcing float on letters
             grade_value = r.grade if r.grade is not None else r.quiz_score
             test_label = r.subject_name
@@ -2563,23 +2457,116 @@ def teacher_report_data():
                 "test_date": r.test_date.isoformat() if r.test_date else None,
             })
 
-        return jsonify({"ok": True, "results": results})
+        return conditional.tag(jsonify({
+            "ok": True,
+            "results": results,
+            "total": total,
+            "next_cursor": page.last_cursor if page.has_next else None,
+        }), etag, last_modified)
 
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+TEACHER_REPORT_EXPORT_COLUMNS = [
+    ("result_id", "Entry ID"),
+    ("student_name", "Student Name"),
+    ("subject_name", "Subject"),
+    ("class_name", "Class"),
+    ("test_date", "Test Date"),
+    ("quiz_score", "Score"),
+    ("grade", "Grade"),
+]
+
+
+@app.route("/teacher/report/export")
+def teacher_report_export():
+    """The teacher's results matching the report filters, as CSV or NDJSON (?format=)."""
+    if not is_logged_in() or session.get("role_id") != 2:
+        return redirect(url_for("login"))
+
+    teacher_row = profiles.teacher(session.get("user_id"))
+    if not teacher_row:
+        flash("Teacher profile not found.", "danger")
+        return redirect(url_for("teacher_report"))
+
+    where_sql, params = _teacher_report_filters(teacher_row.teacher_id, request.args)
+    sql = f"""
+        SELECT
+            tr.result_id,
+            u.full_name AS student_name,
+            sub.subject_name,
+            c.class_name,
+            tr.test_date,
+            tr.quiz_score,
+            tr.grade
+        {TEACHER_REPORT_FROM}
+        WHERE {where_sql} AND tr.result_id > :after_id
+        ORDER BY tr.result_id
+        LIMIT :batch_size
+    """
+    return exports.stream(request.args.get("format", "csv"), "student_grades_report",
+                          TEACHER_REPORT_EXPORT_COLUMNS, sql, params)
+
+
+QUESTION_COLUMNS = ["question_text", "option_a", "option_b", "option_c", "option_d", "correct_option"]
+
+
+def _question_row(q):
+    """quiz_questions values for one question of the test form payload."""
+    return {
+        "question_text": (q.get("question") or "").strip(),
+        "option_a": q.get("option_a", ""),
+        "option_b": q.get("option_b", ""),
+        "option_c": q.get("option_c", ""),
+        "option_d": q.get("option_d", ""),
+        "correct_option": q.get("correct_option", ""),
+    }
+
+
+def _save_questions(quiz_id, questions, existing=()):
+    """
+    Write the form's questions for quiz_id as a diff against `existing` (the
+    quiz's current rows): one multi-row INSERT for new questions, one CASE
+    UPDATE for changed ones and one DELETE for those dropped from the form.
+    Kept questions keep their question_id, which drafts and answers refer to;
+    ids that are not among `existing` are inserted as new questions.
+    """
+    current = {row["question_id"]: row for row in existing}
+    new_rows, changed_rows, kept = [], [], set()
+    for q in questions:
+        row = _question_row(q)
+        try:
+            question_id = int(q.get("question_id") or 0)
+        except (TypeError, ValueError):
+            question_id = 0
+        old = current.get(question_id)
+        if old is None or question_id in kept:
+            new_rows.append({"quiz_id": quiz_id, **row})
+            continue
+        kept.add(question_id)
+        if any(old[col] != row[col] for col in QUESTION_COLUMNS):
+            changed_rows.append({"question_id": question_id, **row})
+
+    removed = [question_id for question_id in current if question_id not in kept]
+    if removed:
+        params = {f"r_{i}": question_id for i, question_id in enumerate(removed)}
+        db.session.execute(db.text(f"""
+            DELETE FROM quiz_questions
+            WHERE quiz_id = :qid AND question_id IN ({', '.join(':' + k for k in params)})
+        """), {"qid": quiz_id, **params})
+    update_rows("quiz_questions", "question_id", QUESTION_COLUMNS, changed_rows)
+    if new_rows:
+        insert_rows("quiz_questions", ["quiz_id"] + QUESTION_COLUMNS, new_rows)
+
+
 @app.route("/teacher/test_creation", methods=["GET", "POST"])
 def teacher_test_creation():
     if not is_logged_in() or session.get("role_id") != 2:
         return redirect(url_for("login"))
 
     user_id = session.get("user_id")
-    teacher_row = db.session.execute(db.text("""
-        SELECT teacher_id, subject_id
-        FROM teachers
-        WHERE users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    teacher_row = profiles.teacher(user_id)
 
     if not teacher_row:
         flash("Teacher profile not found. Please contact the administrator to link your teacher profile.", "danger")
@@ -2645,25 +2632,11 @@ def teacher_test_creation():
             })
 
             quiz_id = result.lastrowid
-
-            for q in questions:
-                db.session.execute(db.text("""
-                    INSERT INTO quiz_questions 
-                        (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_option)
-                    VALUES 
-                        (:quiz_id, :question_text, :option_a, :option_b, :option_c, :option_d, :correct_option)
-                """), {
-                    "quiz_id": quiz_id,
-                    "question_text": q.get("question", "").strip(),
-                    "option_a": q.get("option_a", ""),
-                    "option_b": q.get("option_b", ""),
-                    "option_c": q.get("option_c", ""),
-                    "option_d": q.get("option_d", ""),
-                    "correct_option": q.get("correct_option", "")
-                })
+            _save_questions(quiz_id, questions)
 
             db.session.commit()
             log_activity(user_id, f"Created quiz '{title}'")
+            quiz_content.warm(quiz_id)
 
             meta = db.session.execute(db.text("""
                 SELECT c.class_name, c.grade_level, s.subject_name
@@ -2735,25 +2708,30 @@ def teacher_grade_data():
         return jsonify({"ok": False, "error": "Unauthorized"}), 401
 
     user_id = session.get("user_id")
-    teacher_row = db.session.execute(db.text("""
-        SELECT teacher_id, subject_id
-        FROM teachers
-        WHERE users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    teacher_row = profiles.teacher(user_id)
 
     if not teacher_row:
         return jsonify({"ok": False, "error": "Teacher profile not found."}), 404
 
+    version, ref_etag = _teacher_data_version(teacher_row.teacher_id)
+    etag = conditional.make_etag(
+        "teacher-grade", teacher_row.teacher_id, tuple(version), ref_etag,
+        int(time.time() // CONDITIONAL_WINDOW_SECONDS),
+    )
+    cached = conditional.not_modified(etag)
+    if cached:
+        return cached
+
     rows = db.session.execute(db.text("""
         SELECT
             c.class_id,
             c.class_name,
             c.grade_level,
-            COUNT(DISTINCT s.student_id) AS student_count,
-            COUNT(tr.result_id) AS taken_count,
-            SUM(CASE WHEN tr.quiz_score >= 60 THEN 1 ELSE 0 END) AS pass_count,
-            AVG(tr.quiz_score) AS avg_score,
-            MAX(tr.test_date) AS last_test,
+            (SELECT COUNT(*) FROM students s WHERE s.class_id = c.class_id) AS student_count,
+            COALESCE(SUM(r.result_count), 0) AS taken_count,
+            COALESCE(SUM(r.pass_count), 0) AS pass_count,
+            SUM(r.score_sum) / NULLIF(SUM(r.result_count), 0) AS avg_score,
+            MAX(r.last_test_date) AS last_test,
             (
                 SELECT MIN(q.start_time)
                 FROM quizzes q
@@ -2764,8 +2742,7 @@ def teacher_grade_data():
             ) AS next_test
         FROM classes c
         JOIN classes_has_teachers cht ON cht.classes_class_id = c.class_id
-        LEFT JOIN students s ON s.class_id = c.class_id
-        LEFT JOIN test_results tr ON tr.class_id = c.class_id AND tr.teacher_id = :tid
+        LEFT JOIN result_rollups r ON r.class_id = c.class_id AND r.teacher_id = :tid
         WHERE cht.teachers_teacher_id = :tid AND c.is_active = 1
         GROUP BY c.class_id, c.class_name, c.grade_level
         ORDER BY c.grade_level, c.class_name
@@ -2799,7 +2776,7 @@ def teacher_grade_data():
             "subjects": [subject_row.subject_name] if subject_row else []
         })
 
-    return jsonify({"ok": True, "classes": classes})
+    return conditional.tag(jsonify({"ok": True, "classes": classes}), etag)
 
 
 @app.route("/teacher/tests", methods=["GET"])
@@ -2808,11 +2785,7 @@ def teacher_tests():
         return redirect(url_for("login"))
 
     user_id = session.get("user_id")
-    teacher_row = db.session.execute(db.text("""
-        SELECT teacher_id
-        FROM teachers
-        WHERE users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    teacher_row = profiles.teacher(user_id)
 
     if not teacher_row:
         return jsonify([])
@@ -2863,11 +2836,7 @@ def teacher_test_detail(quiz_id):
         return redirect(url_for("login"))
 
     user_id = session.get("user_id")
-    teacher_row = db.session.execute(db.text("""
-        SELECT teacher_id, subject_id
-        FROM teachers
-        WHERE users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    teacher_row = profiles.teacher(user_id)
 
     if not teacher_row:
         return jsonify({"ok": False, "error": "Teacher profile not found."}), 404
@@ -2976,26 +2945,17 @@ def teacher_test_detail(quiz_id):
             "tid": teacher_row.teacher_id
         })
 
-        db.session.execute(db.text("DELETE FROM quiz_questions WHERE quiz_id = :qid"), {"qid": quiz_id})
-
-        for q in questions:
-            db.session.execute(db.text("""
-                INSERT INTO quiz_questions 
-                    (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_option)
-                VALUES 
-                    (:quiz_id, :question_text, :option_a, :option_b, :option_c, :option_d, :correct_option)
-            """), {
-                "quiz_id": quiz_id,
-                "question_text": q.get("question", "").strip(),
-                "option_a": q.get("option_a", ""),
-                "option_b": q.get("option_b", ""),
-                "option_c": q.get("option_c", ""),
-                "option_d": q.get("option_d", ""),
-                "correct_option": q.get("correct_option", "")
-            })
+        existing = db.session.execute(db.text(f"""
+            SELECT question_id, {', '.join(QUESTION_COLUMNS)}
+            FROM quiz_questions
+            WHERE quiz_id = :qid
+        """), {"qid": quiz_id}).mappings().fetchall()
+        _save_questions(quiz_id, questions, existing)
 
+        quiz_content.bump_version(quiz_id)
         db.session.commit()
         log_activity(user_id, f"Updated quiz '{title}'")
+        quiz_content.warm(quiz_id)
 
         return jsonify({"ok": True})
     except Exception as e:
@@ -3011,11 +2971,7 @@ def student_dashboard():
 
     now = datetime.now()
 
-    student_row = db.session.execute(db.text("""
-        SELECT s.student_id, s.class_id
-        FROM students s
-        WHERE s.users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    student_row = profiles.student(user_id)
 
     available_quizzes = []
 
@@ -3089,43 +3045,35 @@ def student_quiz():
     quiz_id = request.args.get("id", type=int)
 
     user_id = session.get("user_id")
-    student_row = db.session.execute(db.text("""
-        SELECT s.student_id, s.class_id
-        FROM students s
-        WHERE s.users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    student_row = profiles.student(user_id)
 
     if not student_row:
         flash("Student profile not found.", "danger")
         return redirect(url_for("student_dashboard"))
 
-    quiz_data = None
+    quiz_json = None
 
     if quiz_id:
+        # Eligibility only; the question payload comes from the quiz content cache
         quiz_row = db.session.execute(db.text("""
             SELECT 
                 q.quiz_id,
-                q.title,
                 q.class_id,
-                q.subject_id,
-                q.teacher_id,
-                q.exam_type,
-                q.percentage_weight,
                 q.start_time,
                 q.end_time,
-                c.class_name,
-                c.grade_level,
-                s.subject_name
+                COALESCE(v.version, 0) AS content_version,
+                EXISTS (
+                    SELECT 1 FROM quiz_results r
+                    WHERE r.quiz_id = q.quiz_id AND r.student_id = :sid
+                ) AS taken
             FROM quizzes q
-            JOIN classes c ON c.class_id = q.class_id
-            JOIN subjects s ON s.subject_id = q.subject_id
+            LEFT JOIN quiz_content_versions v ON v.quiz_id = q.quiz_id
             WHERE q.quiz_id = :qid AND q.is_active = 1
-        """), {"qid": quiz_id}).fetchone()
+        """), {"qid": quiz_id, "sid": student_row.student_id}).fetchone()
 
         if quiz_row and quiz_row.class_id == student_row.class_id:
             # Prevent reopening a quiz the student already submitted
-            taken = db.session.execute(db.text("SELECT 1 FROM quiz_results WHERE quiz_id = :qid AND student_id = :sid LIMIT 1"), {"qid": quiz_id, "sid": student_row.student_id}).fetchone()
-            if taken:
+            if quiz_row.taken:
                 flash("You have already submitted this quiz.", "warning")
                 return redirect(url_for("student_dashboard"))
 
@@ -3136,53 +3084,14 @@ def student_quiz():
             if quiz_row.end_time and now > quiz_row.end_time:
                 flash("This quiz is closed.", "danger")
                 return redirect(url_for("student_dashboard"))
-            questions = db.session.execute(db.text("""
-                SELECT question_id, question_text, option_a, option_b, option_c, option_d, correct_option
-                FROM quiz_questions
-                WHERE quiz_id = :qid
-                ORDER BY question_id
-            """), {"qid": quiz_id}).fetchall()
-
-            if not questions:
+
+            content = quiz_content.payload(quiz_id, quiz_row.content_version)
+            if not content["question_count"]:
                 flash("This quiz has no questions configured yet.", "warning")
                 return redirect(url_for("student_dashboard"))
+            quiz_json = Markup(content["json"])
 
-            duration_minutes = 30
-            if quiz_row.start_time and quiz_row.end_time:
-                duration_minutes = int((quiz_row.end_time - quiz_row.start_time).total_seconds() // 60)
-
-            def option_index(letter: str) -> int:
-                mapping = {"A": 0, "B": 1, "C": 2, "D": 3}
-                return mapping.get((letter or "").upper(), 0)
-
-            quiz_data = {
-                "info": {
-                    "id": quiz_row.quiz_id,
-                    "title": quiz_row.title,
-                    "subject": quiz_row.subject_name,
-                    "timeLimit": duration_minutes,
-                    "type": quiz_row.exam_type or "exam",
-                    "instructions": [
-                        "Read each question carefully before selecting your answer",
-                        "You can navigate between questions using the Previous and Next buttons",
-                        "Your answers will be auto-saved every 30 seconds",
-                        "Make sure to submit your quiz before the timer runs out",
-                        "Once submitted, you cannot change your answers"
-                    ]
-                },
-                "questions": [
-                    {
-                        "id": q.question_id,
-                        "text": q.question_text,
-                        "type": "mcq",
-                        "options": [q.option_a, q.option_b, q.option_c, q.option_d],
-                        "correctAnswer": option_index(q.correct_option),
-                    }
-                    for q in questions
-                ]
-            }
-
-    return render_template("student/quiz.html", quiz_data=quiz_data)
+    return render_template("student/quiz.html", quiz_json=quiz_json)
 
 
 @app.route("/student/quizzes/<int:quiz_id>/submit", methods=["POST"])
@@ -3190,122 +3099,41 @@ def student_submit_quiz(quiz_id):
     if not is_logged_in() or session.get("role_id") != 3:
         return redirect(url_for("login"))
 
-    user_id = session.get("user_id")
-    student_row = db.session.execute(db.text("""
-        SELECT s.student_id, s.class_id
-        FROM students s
-        WHERE s.users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
-
-    if not student_row:
-        return jsonify({"ok": False, "error": "Student profile not found."}), 404
-
-    quiz_row = db.session.execute(db.text("""
-        SELECT quiz_id, class_id, subject_id, teacher_id, start_time, end_time
-        FROM quizzes
-        WHERE quiz_id = :qid AND is_active = 1
-    """), {"qid": quiz_id}).fetchone()
-
-    if not quiz_row or quiz_row.class_id != student_row.class_id:
-        return jsonify({"ok": False, "error": "Quiz not available."}), 404
-
-    # Prevent duplicate submissions (use existing quiz_results table)
-    exists = db.session.execute(db.text("SELECT 1 FROM quiz_results WHERE quiz_id = :qid AND student_id = :sid LIMIT 1"), {"qid": quiz_id, "sid": student_row.student_id}).fetchone()
-    if exists:
-        return jsonify({"ok": False, "error": "Quiz already submitted."}), 400
-
-    now = datetime.now()
-    if quiz_row.start_time and now < quiz_row.start_time:
-        return jsonify({"ok": False, "error": "Quiz not open yet."}), 403
-    if quiz_row.end_time and now > quiz_row.end_time:
-        return jsonify({"ok": False, "error": "Quiz has closed."}), 403
-
-    data = request.get_json(silent=True) or {}
-    answers = data.get("answers") or []
-
-    if not answers:
-        return jsonify({"ok": False, "error": "No answers submitted."}), 400
-
-    answer_map = {int(item.get("question_id")): (item.get("selected_option") or "").upper() for item in answers if item.get("question_id")}
-
-    if not answer_map:
-        return jsonify({"ok": False, "error": "Invalid answers payload."}), 400
-
-    questions = db.session.execute(db.text("""
-        SELECT question_id, correct_option
-        FROM quiz_questions
-        WHERE quiz_id = :qid
-    """), {"qid": quiz_id}).fetchall()
-
-    if not questions:
-        return jsonify({"ok": False, "error": "Quiz has no questions."}), 400
+    try:
+        answer_map = submissions.parse_answers(request.get_json(silent=True))
+        outcome = submissions.submit(session.get("user_id"), quiz_id, answer_map)
+    except submissions.SubmissionError as e:
+        return jsonify({"ok": False, "error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
 
-    mapping = {"A": 0, "B": 1, "C": 2, "D": 3}
-    total = len(questions)
-    correct = 0
+    return jsonify(outcome)
 
-    for q in questions:
-        sel_letter = answer_map.get(q.question_id)
-        if not sel_letter:
-            continue
-        if mapping.get(sel_letter, -1) == mapping.get((q.correct_option or "").upper(), -2):
-            correct += 1
 
-    score_percent = round((correct / total) * 100, 2)
+@app.route("/student/quizzes/<int:quiz_id>/draft", methods=["GET", "PUT", "POST"])
+def student_quiz_draft(quiz_id):
+    """Auto-saved answers; saves are buffered and written in batches (drafts.py). POST is for sendBeacon."""
+    if not is_logged_in() or session.get("role_id") != 3:
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    user_id = session.get("user_id")
 
-    def letter_grade(score: float) -> str:
-        if score >= 90:
-            return "A"
-        if score >= 80:
-            return "B"
-        if score >= 70:
-            return "C"
-        if score >= 60:
-            return "D"
-        return "F"
+    if request.method == "GET":
+        answers, saved_at = drafts.load(quiz_id, user_id)
+        return jsonify({"ok": True, "answers": answers, "saved_at": saved_at.isoformat() if saved_at else None})
 
-    grade_letter = letter_grade(score_percent)
+    if (request.content_length or 0) > drafts.MAX_BODY_BYTES:
+        return jsonify({"ok": False, "error": "Draft too large."}), 413
+    student_row = profiles.student(user_id)
+    if not student_row:
+        return jsonify({"ok": False, "error": "Student profile not found."}), 404
 
+    data = request.get_json(silent=True, force=True) or {}
     try:
-        db.session.execute(db.text("""
-            INSERT INTO test_results (test_date, student_id, class_id, subject_id, teacher_id, quiz_score)
-            VALUES (:test_date, :student_id, :class_id, :subject_id, :teacher_id, :quiz_score)
-        """), {
-            "test_date": datetime.utcnow(),
-            "student_id": student_row.student_id,
-            "class_id": quiz_row.class_id,
-            "subject_id": quiz_row.subject_id,
-            "teacher_id": quiz_row.teacher_id,
-            "quiz_score": score_percent
-        })
-        db.session.commit()
-        # Also mark this quiz as submitted for this student (record in existing quiz_results table)
-        try:
-            db.session.execute(db.text("""
-                INSERT INTO quiz_results (quiz_id, student_id, score, submitted_at)
-                VALUES (:qid, :sid, :score, :time)
-            """), {
-                "qid": quiz_id,
-                "sid": student_row.student_id,
-                "score": score_percent,
-                "time": datetime.utcnow()
-            })
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
-
-        log_activity(user_id, f"Submitted quiz {quiz_id} with score {score_percent}%")
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"ok": False, "error": str(e)}), 500
-
-    return jsonify({
-        "ok": True,
-        "score": score_percent,
-        "correct": correct,
-        "total": total,
-        "grade": grade_letter
-    })
+        drafts.check_open(quiz_id, student_row.class_id)
+        drafts.save(quiz_id, user_id, data.get("answers"))
+    except drafts.DraftError as e:
+        return jsonify({"ok": False, "error": str(e)}), e.status
+    return jsonify({"ok": True})
 
 
 @app.route("/student/report")
@@ -3321,15 +3149,25 @@ def student_report_data():
         return jsonify({"ok": False, "error": "Unauthorized"}), 401
 
     user_id = session.get("user_id")
-    student_row = db.session.execute(db.text("""
-        SELECT student_id
-        FROM students
-        WHERE users_user_id = :uid
-    """), {"uid": user_id}).fetchone()
+    student_row = profiles.student(user_id)
 
     if not student_row:
         return jsonify({"ok": False, "error": "Student profile not found."}), 404
 
+    # The report only changes when a result is added, so count + newest id identify it
+    version = db.session.execute(db.text("""
+        SELECT COUNT(*) AS result_count, MAX(result_id) AS max_result_id, MAX(test_date) AS last_test_date
+        FROM test_results
+        WHERE student_id = :sid
+    """), {"sid": student_row.student_id}).fetchone()
+    etag = conditional.make_etag(
+        "student-report", student_row.student_id, tuple(version), reference.get().etag
+    )
+    last_modified = version.last_test_date if isinstance(version.last_test_date, datetime) else None
+    cached = conditional.not_modified(etag, last_modified)
+    if cached:
+        return cached
+
     rows = db.session.execute(db.text("""
         SELECT
             tr.result_id,
@@ -3398,13 +3236,13 @@ def student_report_data():
         "top": top_score,
     }
 
-    return jsonify({
+    return conditional.tag(jsonify({
         "ok": True,
         "summary": summary,
         "labels": labels[::-1],
         "scores": scores[::-1],
         "results": data_rows,
-    })
+    }), etag, last_modified)
 
 @app.route("/admin/manage_grades", methods=["GET"])
 def admin_manage_grades():
@@ -3445,9 +3283,9 @@ def admin_manage_grades():
 
             -- Next test date
             (
-                SELECT MIN(test_date)
-                FROM test_results tr
-                WHERE tr.class_id = c.class_id
+                SELECT MIN(r.first_test_date)
+                FROM result_rollups r
+                WHERE r.class_id = c.class_id
             ) AS next_test_date
 
         FROM classes c
@@ -3492,21 +3330,10 @@ def admin_manage_grades():
             "teacher_subjects": r.teacher_subjects.split(", ") if r.teacher_subjects else []
         })
 
-    # Teacher Dropdown
-    teachers = db.session.execute(db.text("""
-        SELECT DISTINCT u.full_name
-        FROM teachers t
-        JOIN users u ON u.user_id = t.users_user_id
-        WHERE u.is_active = 1
-        ORDER BY u.full_name
-    """)).fetchall()
-
-    # Year Dropdown
-    years = db.session.execute(db.text("""
-        SELECT DISTINCT academic_year
-        FROM classes
-        ORDER BY academic_year DESC
-    """)).fetchall()
+    # Teacher / Year Dropdowns
+    ref = reference.get()
+    teachers = [{"full_name": name} for name in ref.active_teacher_names]
+    years = [{"academic_year": year} for year in ref.academic_years]
 
     return render_template(
         "admin/grade.html",
@@ -3645,43 +3472,59 @@ def class_results(grade, class_name):
     # later you can load results from DB here
     return render_template("admin/results_page.html", grade=grade, class_name=class_name)
 def log_activity(user_id, action):
-    """Store activity with clean formatted user name and role."""
-
-    try:
-        # Get actor name (Admin / Teacher / Student)
-        user = User.query.get(user_id)
-        actor_name = user.full_name if user else "Unknown User"
-
-        # Final formatted text stored in DB
-        final_action = f"{action}."
-
-        db.session.execute(db.text("""
-            INSERT INTO activity_logs (user_id, action)
-            VALUES (:user_id, :action)
-        """), {
-            "user_id": user_id,
-            "action": final_action
-        })
-
-        db.session.commit()
+    """Queue an activity log entry; it is written in batches off the request path (activity.py)."""
+    activity.record(user_id, f"{action}.")
 
-    except Exception as e:
-        print("Activity Log Error:", e)
-        db.session.rollback()
-        
 @app.route("/admin/get_classes/<grade>")
 def get_classes(grade):
-    rows = db.session.execute(db.text("""
-        SELECT class_id, class_name
-        FROM classes
-        WHERE grade_level = :grade AND is_active = 1
-        ORDER BY class_name ASC
-    """), {"grade": grade}).fetchall()
-
-    return jsonify([
-        {"id": r.class_id, "name": r.class_name}
-        for r in rows
+    return reference.conditional_json(lambda ref: [
+        {"id": c["class_id"], "name": c["class_name"]}
+        for c in ref.active_classes_by_grade.get(grade, [])
     ])
 
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the result_rollups summary table from test_results."""
+    count = rollups.rebuild()
+    print(f"Rebuilt {count} rollup rows.")
+
+
+@app.cli.command("create-tables")
+def create_tables_command():
+    """Create the tables the app adds to the original schema (also run at server start)."""
+    lines = schema.prepare()
+    for line in lines:
+        print(line)
+    if not lines:
+        print("Nothing to do; all app tables exist.")
+
+
+@app.cli.command("create-indexes")
+@click.option("--dry-run", is_flag=True, help="Print the CREATE INDEX statements instead of running them.")
+def create_indexes_command(dry_run):
+    """Create the composite indexes in models.HOT_INDEXES that are missing."""
+    created = indexes.apply(dry_run=dry_run)
+    if not dry_run:
+        for name, table, columns in created:
+            print(f"Created {name} on {table} ({', '.join(columns)}).")
+        print(f"{len(created)} index(es) created, {len(indexes.missing())} still missing.")
+
+
+@app.cli.command("check-indexes")
+def check_indexes_command():
+    """EXPLAIN the hot queries and report full table / index scans."""
+    for name, table, columns, _ in indexes.missing():
+        print(f"Missing index {name} on {table} ({', '.join(columns)})")
+    scans = indexes.check()
+    for label, table, access, rows in scans:
+        print(f"Full scan ({access}) of {table} in {label}, ~{rows} rows")
+    if scans:
+        raise SystemExit(1)
+    print(f"No full scans in {len(indexes.HOT_QUERIES)} hot queries.")
+
+
 if __name__ == "__main__":
+    with app.app_context():
+        for line in schema.prepare() + jobs.recover():
+            print(line)
     app.run(debug=True)
@@ -0,0 +1,95 @@
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models import db
+import submissions
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure quiz submissions per second through the submission engine.")
+    parser.add_argument("--quiz-id", type=int, required=True, help="quiz to submit; its class supplies the students")
+    parser.add_argument("--students", type=int, default=200, help="number of students submitting")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent submitters (keep <= pool size + overflow)")
+    parser.add_argument("--commit", action="store_true",
+                        help="keep the submissions (default rolls each one back, leaving the database unchanged)")
+    return parser.parse_args(argv)
+
+
+def _inside_window(start_time, end_time):
+    """A submission time the quiz accepts: the window midpoint, or now clamped to the one bound it has."""
+    if start_time and end_time:
+        return start_time + (end_time - start_time) / 2
+    if start_time:
+        return max(start_time, datetime.now())
+    if end_time:
+        return min(end_time, datetime.now())
+    return datetime.now()
+
+
+def _submit_one(app, user_id, quiz_id, answer_map, commit, now):
+    with app.app_context():
+        start = time.perf_counter()
+        try:
+            submissions.submit(user_id, quiz_id, answer_map, now=now, commit=commit)
+            ok = True
+        except submissions.SubmissionError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+
+def bench_submissions(argv=None):
+    args = _parse_args(argv)
+    from app import app
+
+    with app.app_context():
+        quiz = db.session.execute(db.text(
+            "SELECT class_id, start_time, end_time FROM quizzes WHERE quiz_id = :qid"
+        ), {"qid": args.quiz_id}).fetchone()
+        if not quiz:
+            raise SystemExit(f"Quiz {args.quiz_id} not found.")
+        user_ids = [r[0] for r in db.session.execute(db.text("""
+            SELECT users_user_id FROM students WHERE class_id = :cid ORDER BY student_id LIMIT :n
+        """), {"cid": quiz.class_id, "n": args.students}).fetchall()]
+        question_ids = [r[0] for r in db.session.execute(db.text(
+            "SELECT question_id FROM quiz_questions WHERE quiz_id = :qid"
+        ), {"qid": args.quiz_id}).fetchall()]
+        db.session.remove()
+
+    # Submit inside the quiz window even if it has closed, so the full grading path is timed
+    now = _inside_window(quiz.start_time, quiz.end_time)
+
+    if not user_ids or not question_ids:
+        raise SystemExit("Quiz class has no students or the quiz has no questions.")
+
+    answers = [{qid: random.choice("ABCD") for qid in question_ids} for _ in user_ids]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        outcomes = list(pool.map(
+            lambda pair: _submit_one(app, pair[0], args.quiz_id, pair[1], args.commit, now),
+            zip(user_ids, answers),
+        ))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, _ in outcomes)
+    accepted = sum(1 for _, ok in outcomes if ok)
+    print("--------------------------------------------------")
+    print(f"{len(outcomes)} submissions ({accepted} accepted) with {args.threads} threads in {elapsed:.2f}s")
+    print(f"{len(outcomes) / elapsed:.1f} submissions/s")
+    print(f"latency p50 {statistics.median(latencies):.1f} ms, "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.1f} ms, max {latencies[-1]:.1f} ms")
+    if not args.commit:
+        print("Rolled back; nothing was written.")
+    print("--------------------------------------------------")
+
+
+# -------------------------------------------------------------
+# Script will only run manually.
+# Won't run when imported by Flask.
+# -------------------------------------------------------------
+if __name__ == "__main__":
+    bench_submissions()
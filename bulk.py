@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from models import db
+
+
+DEFAULT_CHUNK_SIZE = 500
+# Default hashing processes per web worker; PASSWORD_HASH_WORKERS overrides it
+MAX_DEFAULT_HASH_WORKERS = 4
+
+
+def insert_rows(table, columns, rows, chunk_size=DEFAULT_CHUNK_SIZE, suffix=""):
+    """
+    Insert dict rows with one multi-row INSERT per chunk on the current session.
+    `suffix` is appended verbatim, e.g. an ON DUPLICATE KEY UPDATE clause.
+    """
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        params = {}
+        values = []
+        for i, row in enumerate(chunk):
+            placeholders = []
+            for col in columns:
+                key = f"{col}_{i}"
+                params[key] = row.get(col)
+                placeholders.append(f":{key}")
+            values.append("(" + ", ".join(placeholders) + ")")
+        db.session.execute(db.text(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join(values)} {suffix}"
+        ), params)
+
+
+def hash_workers(limit=MAX_DEFAULT_HASH_WORKERS):
+    """PASSWORD_HASH_WORKERS, else the CPU count capped at `limit` (None: all cores, for the CLI)."""
+    try:
+        return max(1, int(os.environ["PASSWORD_HASH_WORKERS"]))
+    except KeyError:
+        cpus = os.cpu_count() or 1
+        return cpus if limit is None else min(limit, cpus)
+    except ValueError:
+        return 1
+
+
+def hash_pool(workers):
+    """
+    Process pool for hash_passwords. Spawned, not forked: the web workers
+    run these from job threads while holding DB pool and lock state.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def hash_passwords(plaintexts, workers=None, executor=None):
+    """
+    Hash passwords across a process pool; werkzeug hashing is deliberately slow
+    and CPU bound, so threads would not help. Small batches stay in-process.
+    Pass a long-lived `executor` (see hash_pool) when hashing many batches in a row.
+    """
+    plaintexts = list(plaintexts)
+    workers = hash_workers() if workers is None else workers
+    if executor is None and (workers <= 1 or len(plaintexts) < workers * 2):
+        return [generate_password_hash(p) for p in plaintexts]
+    chunksize = max(1, len(plaintexts) // (workers * 4))
+    if executor is not None:
+        return list(executor.map(generate_password_hash, plaintexts, chunksize=chunksize))
+    with hash_pool(workers) as pool:
+        return list(pool.map(generate_password_hash, plaintexts, chunksize=chunksize))
+
+
+def update_rows(table, key, columns, rows, extra_set=""):
+    """
+    Update many rows in one statement: each column is set through a CASE on `key`.
+    `extra_set` is added verbatim to the SET list, e.g. "force_password_change = 1".
+    """
+    if not rows:
+        return
+    params = {}
+    keys = []
+    cases = {col: [] for col in columns}
+    for i, row in enumerate(rows):
+        params[f"k_{i}"] = row[key]
+        keys.append(f":k_{i}")
+        for col in columns:
+            params[f"{col}_{i}"] = row[col]
+            cases[col].append(f"WHEN :k_{i} THEN :{col}_{i}")
+    assignments = [f"{col} = CASE {key} {' '.join(cases[col])} END" for col in columns]
+    if extra_set:
+        assignments.append(extra_set)
+    db.session.execute(db.text(
+        f"UPDATE {table} SET {', '.join(assignments)} WHERE {key} IN ({', '.join(keys)})"
+    ), params)
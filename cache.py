@@ -0,0 +1,155 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+DEFAULT_TTL = int(os.environ.get("CACHE_TTL", 60))   # seconds
+# "memory" keeps entries per process; "sqlite" shares them (and invalidations)
+# between the gunicorn workers on one host through a local SQLite file. With
+# several workers (WEB_CONCURRENCY, read by gunicorn.conf.py) a per-process
+# cache would keep serving data another worker has just changed, so sqlite
+# is the default there.
+_WORKERS = int(os.environ.get("WEB_CONCURRENCY", 1))
+BACKEND = os.environ.get("CACHE_BACKEND", "sqlite" if _WORKERS > 1 else "memory").strip().lower()
+CACHE_PATH = os.environ.get("CACHE_PATH", os.path.join(tempfile.gettempdir(), "dbms-puc-cache.sqlite3"))
+
+_lock = threading.Lock()
+_store = {}   # key -> (expires_at, value)
+_loading = {}  # key -> [lock held while one thread runs the loader, threads using it]
+
+
+class _MemoryStore:
+    def get(self, key):
+        with _lock:
+            entry = _store.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del _store[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with _lock:
+            _store[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, prefix):
+        with _lock:
+            for key in [k for k in _store if k.startswith(prefix)]:
+                del _store[key]
+
+    def clear(self):
+        with _lock:
+            _store.clear()
+
+
+class _SQLiteStore:
+    """
+    Entries pickled into one table of a local SQLite file. Expiry uses wall
+    clock time since several processes share it. Errors are printed and
+    treated as a miss, so a broken cache file only costs the database query.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL, value BLOB)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute(
+                "SELECT expires_at, value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print("Cache read error:", e)
+            return None
+        if row is None or row[0] < time.time():
+            return None
+        return pickle.loads(row[1])
+
+    def set(self, key, value, ttl):
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, time.time() + ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+            )
+        except sqlite3.Error as e:
+            print("Cache write error:", e)
+
+    def invalidate(self, prefix):
+        try:
+            conn = self._conn()
+            conn.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            # Expired rows are never read again; sweep them with the invalidation
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        except sqlite3.Error as e:
+            print("Cache invalidate error:", e)
+
+    def clear(self):
+        try:
+            self._conn().execute("DELETE FROM cache")
+        except sqlite3.Error as e:
+            print("Cache clear error:", e)
+
+
+_backend = _SQLiteStore(CACHE_PATH) if BACKEND == "sqlite" else _MemoryStore()
+
+
+def get(key):
+    return _backend.get(key)
+
+
+def set(key, value, ttl=None):
+    _backend.set(key, value, DEFAULT_TTL if ttl is None else ttl)
+
+
+def cached(key, loader, ttl=None):
+    """
+    Return the cached value for `key`, calling loader() on a miss. Concurrent
+    misses on the same key in one process wait for a single loader call.
+    Cache plain dicts/lists, not ORM objects: the memory backend shares them
+    between threads and the sqlite backend pickles them.
+    """
+    value = get(key)
+    if value is not None:
+        return value
+    with _lock:
+        entry = _loading.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            value = get(key)
+            if value is None:
+                value = loader()
+                set(key, value, ttl)
+    finally:
+        # The last thread out drops the lock; popping it earlier would let a
+        # new miss create a second lock and run the loader again.
+        with _lock:
+            entry[1] -= 1
+            if not entry[1]:
+                _loading.pop(key, None)
+    return value
+
+
+def invalidate(prefix):
+    """Drop every key starting with `prefix`, e.g. "students:" after a student write."""
+    _backend.invalidate(prefix)
+
+
+def clear():
+    _backend.clear()
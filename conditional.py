@@ -0,0 +1,28 @@
+import hashlib
+
+from flask import Response, request
+from werkzeug.http import is_resource_modified
+
+
+def make_etag(*parts):
+    """Short ETag value from whatever identifies the data version (ids, counts, dates)."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+
+
+def not_modified(etag, last_modified=None):
+    """
+    A 304 response if the client's If-None-Match / If-Modified-Since still
+    matches, else None. Check this before running the expensive queries.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return tag(Response(status=304), etag, last_modified)
+
+
+def tag(response, etag, last_modified=None):
+    """Add the validators; no-cache makes the browser revalidate on every visit."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
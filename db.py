@@ -1,10 +1,166 @@
 import os
+import threading
+
 import mysql.connector
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 
 
-def connect_db():
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_flag(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_settings():
+    """
+    Pool sizing read from the environment. Sizes are per process, so a gunicorn
+    deployment opens at most workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+    """
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        # Recycle before the server-side wait_timeout drops idle TLS sessions.
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 280),
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", True),
+        "warmup": _env_int("DB_POOL_WARMUP", 0),
+    }
+
+
+class PoolMetrics:
+    """
+    Thread-safe counters fed by the public pool events. Checkouts that needed
+    an overflow connection, or that left every connection in use (so the next
+    caller waits up to DB_POOL_TIMEOUT), say the pool is too small.
     """
-    Low-level MySQL connection used outside SQLAlchemy, aligned with the provided Aiven URL.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        settings = pool_settings()
+        self._pool_size = settings["pool_size"]
+        self._capacity = settings["pool_size"] + settings["max_overflow"]
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.overflow_checkouts = 0
+            self.full_pool_checkouts = 0
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            if self.in_use > self._pool_size:
+                self.overflow_checkouts += 1
+            if self.in_use >= self._capacity:
+                self.full_pool_checkouts += 1
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def record(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "peak_in_use": self.peak_in_use,
+                "overflow_checkouts": self.overflow_checkouts,
+                "full_pool_checkouts": self.full_pool_checkouts,
+            }
+
+
+engine_pool_metrics = PoolMetrics()
+
+
+@event.listens_for(QueuePool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    engine_pool_metrics.record_checkout()
+
+
+@event.listens_for(QueuePool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    engine_pool_metrics.record_checkin()
+
+
+@event.listens_for(QueuePool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    engine_pool_metrics.record("connects")
+
+
+@event.listens_for(QueuePool, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    engine_pool_metrics.record("invalidations")
+
+
+def engine_options():
+    """SQLALCHEMY_ENGINE_OPTIONS for Flask-SQLAlchemy, driven by pool_settings()."""
+    settings = pool_settings()
+    return {
+        "poolclass": QueuePool,
+        "pool_size": settings["pool_size"],
+        "max_overflow": settings["max_overflow"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_recycle": settings["pool_recycle"],
+        "pool_pre_ping": settings["pool_pre_ping"],
+    }
+
+
+def warm_up_pool(engine, count=None):
+    """Open `count` connections up front so the first requests skip the TLS handshake."""
+    if count is None:
+        count = pool_settings()["warmup"]
+    count = min(count, engine.pool.size())
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.raw_connection())
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
+def pool_stats(engine=None):
+    """Current pool occupancy plus checkout/wait counters, for sizing the pool."""
+    stats = {
+        "settings": pool_settings(),
+        "engine": engine_pool_metrics.snapshot(),
+    }
+    if engine is not None:
+        pool = engine.pool
+        stats["engine"].update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    return stats
+
+
+def _connection_kwargs():
+    """
+    Connection settings aligned with the provided Aiven URL.
     Honors environment variables when present; otherwise defaults to the given Aiven instance.
 
     Aiven URL reference:
@@ -27,7 +183,7 @@ def connect_db():
         # mysql-connector uses tls by default if ssl_disabled is False
         ssl_kwargs["ssl_disabled"] = False
 
-    return mysql.connector.connect(
+    return dict(
         host=host,
         user=user,
         password=password,
@@ -35,3 +191,12 @@ def connect_db():
         port=port,
         **ssl_kwargs
     )
+
+
+def connect_db():
+    """
+    Low-level MySQL connection used outside SQLAlchemy. Each call opens a new
+    connection; code on the request path should use db.session so it shares
+    the engine's pool.
+    """
+    return mysql.connector.connect(**_connection_kwargs())
@@ -0,0 +1,181 @@
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import cache
+from models import db
+from bulk import insert_rows
+
+
+FLUSH_SECONDS = float(os.environ.get("DRAFT_FLUSH_SECONDS", 15))
+MAX_ANSWERS = 500
+MAX_BODY_BYTES = 32 * 1024   # MAX_ANSWERS answers fit well within this
+WINDOW_TTL = 60              # quiz window cache; dropped with the quiz:<id>: prefix on edits
+LETTERS = {"A", "B", "C", "D"}
+
+_app = None
+_lock = threading.Lock()
+_flush_lock = threading.Lock()  # one flush at a time (flusher thread vs. atexit)
+_pending = {}   # (quiz_id, user_id) -> (answers json, saved_at); newest save wins
+_flushing = False
+_discarded = set()  # keys discarded while a flush was in flight; their rows are deleted after it
+_flusher = None
+
+
+class DraftError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def init_drafts(app):
+    """Bind the draft flusher to the Flask app; it starts on the first save."""
+    global _app
+    _app = app
+    atexit.register(flush)
+
+
+def normalize(answers):
+    """{question_id: "A".."D"} from the request body, as compact JSON text."""
+    if not isinstance(answers, dict) or len(answers) > MAX_ANSWERS:
+        raise DraftError("Invalid answers payload.")
+    clean = {}
+    for qid, letter in answers.items():
+        try:
+            qid = int(qid)
+        except (TypeError, ValueError):
+            raise DraftError("Invalid question id.")
+        letter = (letter or "").upper()
+        if letter in LETTERS:
+            clean[str(qid)] = letter
+    return json.dumps(clean, separators=(",", ":"), sort_keys=True)
+
+
+def check_open(quiz_id, class_id, now=None):
+    """Raise DraftError unless the quiz is active, set for class_id and inside its start/end window."""
+    def load():
+        row = db.session.execute(db.text("""
+            SELECT class_id, start_time, end_time FROM quizzes WHERE quiz_id = :qid AND is_active = 1
+        """), {"qid": quiz_id}).fetchone()
+        return {"class_id": row.class_id, "start_time": row.start_time, "end_time": row.end_time} if row else {}
+
+    quiz = cache.cached(f"quiz:{quiz_id}:window", load, ttl=WINDOW_TTL)
+    if not quiz or class_id is None or quiz["class_id"] != class_id:
+        raise DraftError("Quiz not available.", 404)
+    now = now or datetime.now()
+    if (quiz["start_time"] and now < quiz["start_time"]) or (quiz["end_time"] and now > quiz["end_time"]):
+        raise DraftError("Quiz is not open.", 403)
+
+
+def save(quiz_id, user_id, answers):
+    """Buffer a draft in memory; repeated saves by one student collapse into one row write."""
+    payload = normalize(answers)
+    with _lock:
+        _pending[(quiz_id, user_id)] = (payload, datetime.now())
+    _ensure_flusher()
+
+
+def load(quiz_id, user_id):
+    """The newest draft this process knows about: buffered first, then the table."""
+    with _lock:
+        entry = _pending.get((quiz_id, user_id))
+    if entry:
+        return json.loads(entry[0]), entry[1]
+    row = db.session.execute(db.text("""
+        SELECT answers, updated_at FROM quiz_drafts WHERE quiz_id = :qid AND user_id = :uid
+    """), {"qid": quiz_id, "uid": user_id}).fetchone()
+    if not row:
+        return {}, None
+    return json.loads(row.answers), row.updated_at
+
+
+def discard(quiz_id, user_id):
+    """
+    Forget the buffered draft and delete the stored one inside the caller's
+    transaction. Does not wait for a running flush; if that flush was
+    writing this draft, it deletes the row again once it has committed.
+    """
+    with _lock:
+        _pending.pop((quiz_id, user_id), None)
+        if _flushing:
+            _discarded.add((quiz_id, user_id))
+    db.session.execute(db.text(
+        "DELETE FROM quiz_drafts WHERE quiz_id = :qid AND user_id = :uid"
+    ), {"qid": quiz_id, "uid": user_id})
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run, name="draft-flusher", daemon=True)
+            _flusher.start()
+
+
+def _run():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+
+
+def flush():
+    """Upsert every buffered draft with one multi-row statement per chunk."""
+    with _flush_lock:
+        _flush()
+
+
+def _flush():
+    global _pending, _flushing
+    with _lock:
+        if _app is None or not _pending:
+            return
+        batch, _pending = _pending, {}
+        _flushing = True
+    try:
+        _write(batch)
+    finally:
+        with _lock:
+            _flushing = False
+            stale = [key for key in _discarded if key in batch]
+            _discarded.clear()
+        if stale:
+            _delete(stale)
+
+
+def _delete(keys):
+    """Remove drafts that were submitted while the flush was upserting them."""
+    with _app.app_context():
+        try:
+            for quiz_id, user_id in keys:
+                db.session.execute(db.text(
+                    "DELETE FROM quiz_drafts WHERE quiz_id = :qid AND user_id = :uid"
+                ), {"qid": quiz_id, "uid": user_id})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print("Draft cleanup error:", e)
+
+
+def _write(batch):
+    rows = [
+        {"quiz_id": quiz_id, "user_id": user_id, "answers": payload, "updated_at": saved_at}
+        for (quiz_id, user_id), (payload, saved_at) in batch.items()
+    ]
+    with _app.app_context():
+        try:
+            insert_rows("quiz_drafts", ["quiz_id", "user_id", "answers", "updated_at"], rows,
+                        suffix="ON DUPLICATE KEY UPDATE answers = VALUES(answers), updated_at = VALUES(updated_at)")
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Draft flush error ({len(rows)} drafts kept for retry):", e)
+            with _lock:
+                for key, entry in batch.items():
+                    # Keep any newer save that arrived meanwhile; skip drafts submitted meanwhile
+                    if key not in _discarded:
+                        _pending.setdefault(key, entry)
@@ -0,0 +1,43 @@
+# Picked up automatically by `gunicorn app:app` from the project root.
+import os
+
+# gunicorn's own default; raise WEB_CONCURRENCY to run more worker processes
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+
+def on_starting(server):
+    """
+    Create missing app tables (schema.py) and fail jobs left over from the
+    previous server (jobs.recover) once, in the master, before any worker starts.
+    """
+    from app import app
+    from models import db
+    import jobs
+    import schema
+
+    with app.app_context():
+        try:
+            for line in schema.prepare() + jobs.recover():
+                server.log.info(line)
+        except Exception as e:
+            server.log.warning("Database preparation failed: %s", e)
+        finally:
+            # Workers open their own connections
+            db.engine.dispose()
+
+
+def post_worker_init(worker):
+    """Give each worker its own pool and open DB_POOL_WARMUP connections before serving."""
+    from app import app
+    from models import db
+    from db import warm_up_pool
+
+    with app.app_context():
+        # With --preload the engine was created in the master; never share its sockets.
+        db.engine.dispose(close=False)
+        try:
+            opened = warm_up_pool(db.engine)
+            if opened:
+                worker.log.info("Warmed %s database connections", opened)
+        except Exception as e:
+            worker.log.warning("Database pool warmup failed: %s", e)
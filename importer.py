@@ -0,0 +1,262 @@
+import re
+import secrets
+import string
+
+from sqlalchemy import bindparam
+
+from models import db
+from bulk import insert_rows, hash_passwords, DEFAULT_CHUNK_SIZE
+
+
+STUDENT_ROLE_ID = 3
+TEACHER_ROLE_ID = 2
+
+
+def username_base(name):
+    return re.sub(r"[^a-zA-Z0-9]", "", name or "").lower()[:12] or "user"
+
+
+def generate_password(length=10):
+    alphabet = string.ascii_letters + string.digits + "!@#$%^&*()"
+    pw = ''.join(secrets.choice(alphabet) for _ in range(length))
+    # Ensure complexity
+    if not any(c.islower() for c in pw):
+        pw = 'a' + pw[1:]
+    if not any(c.isupper() for c in pw):
+        pw = 'A' + pw[1:]
+    if not any(c.isdigit() for c in pw):
+        pw = '1' + pw[1:]
+    return pw
+
+
+class UsernameAllocator:
+    """
+    Hands out unique usernames (base, base2, base3, ...) against a set of taken
+    lowercase usernames loaded once, instead of one SELECT per candidate.
+    """
+
+    def __init__(self, taken):
+        self.taken = set(taken)
+        self._next = {}
+
+    @classmethod
+    def from_db(cls):
+        rows = db.session.execute(db.text("SELECT LOWER(username) FROM users")).fetchall()
+        return cls(r[0] for r in rows)
+
+    def allocate(self, name):
+        base = username_base(name)
+        candidate = base
+        n = self._next.get(base, 1)
+        if n > 1:
+            candidate = f"{base}{n}"
+        while candidate in self.taken:
+            n += 1
+            candidate = f"{base}{n}"
+        self.taken.add(candidate)
+        self._next[base] = n
+        return candidate
+
+
+class ImportReport:
+    """Outcome of an import: created count, per-row errors and the new credentials."""
+
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+        self.created = 0
+        self.errors = []        # (line number, message)
+        self.credentials = []   # dicts shaped like the session credential list
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    def error_summary(self, limit=5):
+        shown = "; ".join(f"line {line}: {msg}" for line, msg in self.errors[:limit])
+        more = len(self.errors) - limit
+        return shown + (f" (+{more} more)" if more > 0 else "")
+
+
+def _text(row, *keys):
+    for key in keys:
+        value = (row.get(key) or '').strip()
+        if value:
+            return value
+    return ''
+
+
+def _optional_int(value, label):
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{label} '{value}' is not a number")
+
+
+def _resolve_reference_names(subject_names, class_names):
+    """Map subject and class names to ids with a single query."""
+    subject_names = sorted(subject_names) or [""]
+    class_names = sorted(class_names) or [""]
+    rows = db.session.execute(db.text("""
+        SELECT 'subject' AS kind, subject_id AS id, subject_name AS name
+        FROM subjects WHERE subject_name IN :subject_names
+        UNION ALL
+        SELECT 'class' AS kind, class_id AS id, class_name AS name
+        FROM classes WHERE class_name IN :class_names
+    """).bindparams(
+        bindparam("subject_names", expanding=True),
+        bindparam("class_names", expanding=True),
+    ), {"subject_names": subject_names, "class_names": class_names}).fetchall()
+
+    subjects, classes = {}, {}
+    for r in rows:
+        target = subjects if r.kind == "subject" else classes
+        # First match wins, like Query.first() did
+        target.setdefault(r.name, r.id)
+    return subjects, classes
+
+
+def parse_rows(reader, entity, by_name=False, gender=None, default_name='New User'):
+    """
+    Normalise CSV rows into import records. `by_name` reads subject/class names
+    (teacher import page) instead of numeric ids. Returns (records, errors).
+    """
+    records = []
+    errors = []
+    # Line 1 is the header
+    for line, row in enumerate(reader, start=2):
+        try:
+            full_name = _text(row, 'full_name', 'name') or default_name
+            record = {
+                "line": line,
+                "full_name": full_name,
+                "email": _text(row, 'email') or None,
+                "phone": _text(row, 'phone') or None,
+                "gender": gender,
+                "class_id": None,
+                "subject_id": None,
+                "subject_name": None,
+                "class_name": None,
+            }
+            if by_name:
+                record["subject_name"] = _text(row, 'subject') or None
+                record["class_name"] = _text(row, 'class') or None
+            elif entity == 'student':
+                record["class_id"] = _optional_int(_text(row, 'class_id'), "class_id")
+            else:
+                record["subject_id"] = _optional_int(_text(row, 'subject_id'), "subject_id")
+            records.append(record)
+        except ValueError as e:
+            errors.append((line, str(e)))
+    return records, errors
+
+
+def run_import(reader, entity, progress=None, **parse_options):
+    """Parse a CSV DictReader and import it; row parse errors land in the report."""
+    records, errors = parse_rows(reader, entity, **parse_options)
+    report = ImportReport(len(records) + len(errors))
+    for line, message in errors:
+        report.add_error(line, message)
+    report.processed = len(errors)
+    return import_users(records, entity, progress=progress, report=report)
+
+
+def import_users(records, entity, progress=None, chunk_size=DEFAULT_CHUNK_SIZE, report=None):
+    """
+    Batched import of student or teacher accounts.
+
+    Names are resolved in one query, usernames are allocated in memory, passwords
+    are hashed in a process pool and users/students/teachers/class links are
+    written with multi-row INSERTs, committing once per chunk. `progress` is
+    called as progress(processed, total) after each chunk.
+    """
+    report = report or ImportReport(len(records))
+    role_id = STUDENT_ROLE_ID if entity == 'student' else TEACHER_ROLE_ID
+
+    subject_names = {r["subject_name"] for r in records if r["subject_name"]}
+    class_names = {r["class_name"] for r in records if r["class_name"]}
+    if subject_names or class_names:
+        subject_ids, class_ids = _resolve_reference_names(subject_names, class_names)
+        valid = []
+        for r in records:
+            if r["subject_name"] and r["subject_name"] not in subject_ids:
+                report.add_error(r["line"], f"unknown subject '{r['subject_name']}'")
+            elif r["class_name"] and r["class_name"] not in class_ids:
+                report.add_error(r["line"], f"unknown class '{r['class_name']}'")
+            else:
+                r["subject_id"] = subject_ids.get(r["subject_name"], r["subject_id"])
+                r["class_id"] = class_ids.get(r["class_name"], r["class_id"])
+                valid.append(r)
+        report.processed += len(records) - len(valid)
+        records = valid
+
+    allocator = UsernameAllocator.from_db()
+    for r in records:
+        r["username"] = allocator.allocate(r["full_name"].split()[0] if r["full_name"] else entity)
+        r["temp_password"] = generate_password()
+
+    hashes = hash_passwords(r["temp_password"] for r in records)
+    for r, hashed in zip(records, hashes):
+        r["password"] = hashed
+        r["role_id"] = role_id
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        try:
+            _write_chunk(chunk, entity)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for r in chunk:
+                report.add_error(r["line"], f"database error: {e}")
+        else:
+            report.created += len(chunk)
+            for r in chunk:
+                report.credentials.append({
+                    "username": r["username"],
+                    "password": r["temp_password"],
+                    "full_name": r["full_name"],
+                    "email": r["email"] or "",
+                })
+        report.processed += len(chunk)
+        if progress:
+            progress(report.processed, report.total)
+
+    return report
+
+
+def _write_chunk(chunk, entity):
+    insert_rows("users", [
+        "username", "password", "full_name", "email", "phone", "gender",
+        "role_id", "is_active", "force_password_change",
+    ], [dict(r, is_active=1, force_password_change=1) for r in chunk])
+
+    usernames = [r["username"] for r in chunk]
+    id_rows = db.session.execute(db.text(
+        "SELECT user_id, username FROM users WHERE username IN :names"
+    ).bindparams(bindparam("names", expanding=True)), {"names": usernames}).fetchall()
+    user_ids = {row.username.lower(): row.user_id for row in id_rows}
+    for r in chunk:
+        r["user_id"] = user_ids[r["username"]]
+
+    if entity == 'student':
+        insert_rows("students", ["class_id", "users_user_id"], [
+            {"class_id": r["class_id"], "users_user_id": r["user_id"]} for r in chunk
+        ])
+        return
+
+    insert_rows("teachers", ["subject_id", "users_user_id"], [
+        {"subject_id": r["subject_id"], "users_user_id": r["user_id"]} for r in chunk
+    ])
+
+    with_class = [r for r in chunk if r["class_id"]]
+    if with_class:
+        teacher_rows = db.session.execute(db.text(
+            "SELECT teacher_id, users_user_id FROM teachers WHERE users_user_id IN :uids"
+        ).bindparams(bindparam("uids", expanding=True)), {"uids": [r["user_id"] for r in with_class]}).fetchall()
+        teacher_ids = {row.users_user_id: row.teacher_id for row in teacher_rows}
+        insert_rows("classes_has_teachers", ["classes_class_id", "teachers_teacher_id"], [
+            {"classes_class_id": r["class_id"], "teachers_teacher_id": teacher_ids[r["user_id"]]}
+            for r in with_class
+        ])
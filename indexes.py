@@ -0,0 +1,134 @@
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+from models import db, HOT_INDEXES
+
+
+# The predicates behind models.HOT_INDEXES, as app.py runs them. Parameter
+# values only need the right type; EXPLAIN does not depend on matching rows.
+HOT_QUERIES = [
+    ("teacher dashboard: recent results", """
+        SELECT tr.result_id, tr.test_date, tr.quiz_score
+        FROM test_results tr
+        WHERE tr.teacher_id = :tid
+        ORDER BY tr.test_date DESC
+        LIMIT 5
+    """, {"tid": 1}),
+    ("class report: results per class", """
+        SELECT COUNT(*), AVG(tr.quiz_score)
+        FROM test_results tr
+        WHERE tr.class_id = :cid
+    """, {"cid": 1}),
+    ("student results: history", """
+        SELECT tr.result_id, tr.test_date, tr.quiz_score
+        FROM test_results tr
+        WHERE tr.student_id = :sid
+        ORDER BY tr.test_date DESC
+    """, {"sid": 1}),
+    ("student quiz list: already taken", """
+        SELECT 1 FROM quiz_results qr
+        WHERE qr.quiz_id = :qid AND qr.student_id = :sid
+    """, {"qid": 1, "sid": 1}),
+    ("student quiz list: class quizzes", """
+        SELECT q.quiz_id, q.title, q.start_time
+        FROM quizzes q
+        WHERE q.class_id = :cid AND q.is_active = 1
+        ORDER BY q.start_time DESC
+    """, {"cid": 1}),
+    ("teacher dashboard: upcoming tests", """
+        SELECT q.quiz_id, q.title, q.start_time
+        FROM quizzes q
+        WHERE q.teacher_id = :tid
+          AND q.is_active = 1
+          AND q.start_time >= NOW()
+        ORDER BY q.start_time ASC
+        LIMIT 5
+    """, {"tid": 1}),
+    ("admin dashboard: live exam feed", """
+        SELECT q.quiz_id, q.start_time, q.end_time
+        FROM quizzes q
+        WHERE (q.end_time IS NULL OR q.end_time >= NOW())
+        ORDER BY q.start_time ASC
+        LIMIT 30
+    """, {}),
+    ("teacher pages: assigned classes", """
+        SELECT c.class_id, c.class_name
+        FROM classes_has_teachers cht
+        JOIN classes c ON c.class_id = cht.classes_class_id
+        WHERE cht.teachers_teacher_id = :tid AND c.is_active = 1
+    """, {"tid": 1}),
+    ("teacher report: student name prefix", """
+        SELECT u.user_id
+        FROM users u
+        WHERE u.full_name LIKE :search
+    """, {"search": "a%"}),
+    ("admin dashboard: latest activity", """
+        SELECT al.log_id, al.action, al.timestamp
+        FROM activity_logs al
+        ORDER BY al.timestamp DESC
+        LIMIT 5
+    """, {}),
+]
+
+
+def _covered(inspector, table, columns, unique):
+    """True if an existing index (or the primary key) already leads with `columns`."""
+    columns = list(columns)
+    existing = [
+        (ix["column_names"], bool(ix.get("unique")))
+        for ix in inspector.get_indexes(table)
+    ]
+    pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+    if pk:
+        existing.append((pk, True))
+    if unique:
+        return any(cols == columns and is_unique for cols, is_unique in existing)
+    return any(cols[:len(columns)] == columns for cols, _ in existing)
+
+
+def missing():
+    """HOT_INDEXES entries that no existing index covers yet."""
+    inspector = inspect(db.engine)
+    return [
+        entry for entry in HOT_INDEXES
+        if not _covered(inspector, entry[1], entry[2], entry[3])
+    ]
+
+
+def apply(dry_run=False):
+    """
+    Create every missing HOT_INDEXES entry, one DDL statement each, and
+    return the (name, table, columns) created. A failure (e.g. duplicate
+    rows blocking a unique key) is printed and the rest still run.
+    """
+    created = []
+    for name, table, columns, unique in missing():
+        ddl = f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})"
+        if dry_run:
+            print(ddl)
+            continue
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(db.text(ddl))
+            created.append((name, table, columns))
+        except (OperationalError, ProgrammingError, IntegrityError) as e:
+            print(f"Could not create {name} on {table}:", e)
+    return created
+
+
+def check():
+    """
+    EXPLAIN each HOT_QUERIES entry and return its full scans as
+    (label, table alias, access type, estimated rows) tuples. type ALL is a
+    table scan and type index a full index scan; with HOT_INDEXES in place
+    there should be none.
+    """
+    scans = []
+    with db.engine.connect() as conn:
+        for label, sql, params in HOT_QUERIES:
+            rows = conn.execute(db.text("EXPLAIN " + sql), params).mappings().fetchall()
+            for row in rows:
+                access = (row.get("type") or "").upper()
+                if access in ("ALL", "INDEX"):
+                    scans.append((label, row.get("table"), access, row.get("rows")))
+    return scans
@@ -0,0 +1,165 @@
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import db, BackgroundJob
+
+
+# One-time results hold plaintext passwords; they are dropped after this long even if never downloaded
+RESULT_TTL = timedelta(hours=float(os.environ.get("JOB_RESULT_TTL_HOURS", 24)))
+
+_app = None
+_executor = None
+_handlers = {}
+
+
+def init_jobs(app):
+    """Bind the job runner to the Flask app; workers are started lazily on first submit."""
+    global _app
+    _app = app
+
+
+def job(job_type):
+    """
+    Register a handler: handler(ctx, **kwargs) -> dict with message, content,
+    filename, mimetype and one_time (drop the result after the first download).
+    """
+    def decorator(fn):
+        _handlers[job_type] = fn
+        return fn
+    return decorator
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = int(os.environ.get("JOB_WORKERS", 2))
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="admin-job")
+    return _executor
+
+
+class JobContext:
+    """Handed to job handlers so they can report progress without touching the job row directly."""
+
+    PROGRESS_INTERVAL = 1.0
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def progress(self, done, total, message=None):
+        now = time.monotonic()
+        if done < total and now - self._last_write < self.PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        values = {"progress": done, "total": total}
+        if message:
+            values["message"] = message[:500]
+        BackgroundJob.query.filter_by(job_id=self.job_id).update(values)
+        db.session.commit()
+
+
+def expire_results():
+    """Clear one-time results older than RESULT_TTL; returns how many were cleared."""
+    cleared = BackgroundJob.query.filter(
+        BackgroundJob.one_time_result == 1,
+        BackgroundJob.result.isnot(None),
+        BackgroundJob.finished_at < datetime.utcnow() - RESULT_TTL,
+    ).update({"result": None}, synchronize_session=False)
+    db.session.commit()
+    return cleared
+
+
+def has_result(record):
+    """True while the job's result can still be downloaded."""
+    if record.result is None:
+        return False
+    if record.one_time_result and record.finished_at:
+        return record.finished_at >= datetime.utcnow() - RESULT_TTL
+    return True
+
+
+def recover():
+    """
+    Server start only: jobs still queued or running belong to a process that
+    is gone (their kwargs lived in its memory), so mark them failed, and drop
+    expired one-time results. Returns a list of log lines.
+    """
+    interrupted = BackgroundJob.query.filter(
+        BackgroundJob.status.in_(("queued", "running"))
+    ).update({
+        "status": "failed",
+        "message": "Interrupted by a server restart; start the job again.",
+        "finished_at": datetime.utcnow(),
+    }, synchronize_session=False)
+    db.session.commit()
+    lines = []
+    if interrupted:
+        lines.append(f"Marked {interrupted} interrupted jobs as failed")
+    cleared = expire_results()
+    if cleared:
+        lines.append(f"Cleared {cleared} expired job results")
+    return lines
+
+
+def submit(job_type, user_id, **kwargs):
+    """Queue a job and return its id. kwargs stay in memory and go straight to the handler."""
+    if job_type not in _handlers:
+        raise ValueError(f"Unknown job type: {job_type}")
+    expire_results()
+    record = BackgroundJob(job_type=job_type, status='queued', created_by=user_id)
+    db.session.add(record)
+    db.session.commit()
+    job_id = record.job_id
+    _get_executor().submit(_run, job_id, job_type, kwargs)
+    return job_id
+
+
+def _run(job_id, job_type, kwargs):
+    with _app.app_context():
+        BackgroundJob.query.filter_by(job_id=job_id).update({
+            "status": "running", "started_at": datetime.utcnow()
+        })
+        db.session.commit()
+        try:
+            outcome = _handlers[job_type](JobContext(job_id), **kwargs) or {}
+            content = outcome.get("content")
+            if isinstance(content, bytes):
+                content = content.decode("utf-8")
+            BackgroundJob.query.filter_by(job_id=job_id).update({
+                "status": "done",
+                "message": (outcome.get("message") or "Completed.")[:500],
+                "result": content,
+                "result_filename": outcome.get("filename"),
+                "result_mimetype": outcome.get("mimetype"),
+                "one_time_result": 1 if outcome.get("one_time") else 0,
+                "finished_at": datetime.utcnow(),
+            })
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Job {job_id} ({job_type}) failed:", e)
+            traceback.print_exc()
+            BackgroundJob.query.filter_by(job_id=job_id).update({
+                "status": "failed",
+                "message": str(e)[:500],
+                "finished_at": datetime.utcnow(),
+            })
+            db.session.commit()
+
+
+def serialize(record):
+    return {
+        "job_id": record.job_id,
+        "job_type": record.job_type,
+        "status": record.status,
+        "progress": record.progress,
+        "total": record.total,
+        "message": record.message,
+        "has_result": has_result(record),
+        "created_at": record.created_at.isoformat() if record.created_at else None,
+        "started_at": record.started_at.isoformat() if record.started_at else None,
+        "finished_at": record.finished_at.isoformat() if record.finished_at else None,
+    }
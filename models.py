@@ -1,6 +1,7 @@
 import os
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import inspect, text
+from db import engine_options
 
 db = SQLAlchemy()
 
@@ -46,6 +47,33 @@ class Teacher(db.Model):
     user = db.relationship('User', backref=db.backref('teacher_profile', uselist=False))
 
 
+# Association between classes and the teachers assigned to them
+classes_has_teachers = db.Table(
+    'classes_has_teachers',
+    db.Column('classes_class_id', db.Integer, db.ForeignKey('classes.class_id'), primary_key=True),
+    db.Column('teachers_teacher_id', db.Integer, db.ForeignKey('teachers.teacher_id'), primary_key=True),
+)
+
+
+# Composite indexes for the WHERE / JOIN / ORDER BY columns that app.py's raw
+# SQL hits on every dashboard and quiz page. These tables are not modeled
+# here, so the indexes are listed by name and created by indexes.py
+# (`flask --app app create-indexes`). Entries: (name, table, columns, unique).
+HOT_INDEXES = [
+    ('ix_test_results_teacher_date', 'test_results', ('teacher_id', 'test_date'), False),
+    ('ix_test_results_class', 'test_results', ('class_id',), False),
+    ('ix_test_results_student_date', 'test_results', ('student_id', 'test_date'), False),
+    # Lets a duplicate quiz submission fail on insert (see submissions.UNIQUE_INDEX)
+    ('uq_quiz_results_quiz_student', 'quiz_results', ('quiz_id', 'student_id'), True),
+    ('ix_quizzes_class_active_start', 'quizzes', ('class_id', 'is_active', 'start_time'), False),
+    ('ix_quizzes_teacher_start', 'quizzes', ('teacher_id', 'start_time'), False),
+    ('ix_quizzes_end_time', 'quizzes', ('end_time',), False),
+    ('ix_classes_has_teachers_teacher', 'classes_has_teachers', ('teachers_teacher_id',), False),
+    ('ix_activity_logs_timestamp', 'activity_logs', ('timestamp',), False),
+    # Prefix name search on the teacher report (full_name LIKE 'term%')
+    ('ix_users_full_name', 'users', ('full_name',), False),
+]
+
 class Class(db.Model):
     __tablename__ = 'classes'
     class_id = db.Column(db.Integer, primary_key=True)
@@ -64,6 +92,77 @@ class Subject(db.Model):
     is_active = db.Column(db.Integer, default=1)
 
 
+class ResultRollup(db.Model):
+    """Pre-aggregated test_results per class / subject / teacher / academic year."""
+    __tablename__ = 'result_rollups'
+    class_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    subject_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    teacher_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    academic_year = db.Column(db.String(20), primary_key=True)
+
+    result_count = db.Column(db.Integer, nullable=False, default=0)  # scored results only
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+    score_sq_sum = db.Column(db.Float, nullable=False, default=0)
+    pass_count = db.Column(db.Integer, nullable=False, default=0)
+    a_count = db.Column(db.Integer, nullable=False, default=0)
+    b_count = db.Column(db.Integer, nullable=False, default=0)
+    c_count = db.Column(db.Integer, nullable=False, default=0)
+    d_count = db.Column(db.Integer, nullable=False, default=0)
+    f_count = db.Column(db.Integer, nullable=False, default=0)
+    first_test_date = db.Column(db.DateTime)
+    last_test_date = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_result_rollups_teacher_class', 'teacher_id', 'class_id'),
+    )
+
+
+class QuizContentVersion(db.Model):
+    """Bumped whenever a quiz's content changes; part of the quiz payload cache key."""
+    __tablename__ = 'quiz_content_versions'
+    quiz_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DataVersion(db.Model):
+    """Named counters bumped on writes so every worker can tell its in-memory copy is stale."""
+    __tablename__ = 'data_versions'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class QuizDraft(db.Model):
+    """Latest auto-saved answers per quiz and student user, e.g. {"12":"B"}; removed on submit."""
+    __tablename__ = 'quiz_drafts'
+    quiz_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    answers = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class BackgroundJob(db.Model):
+    """Admin work run off the request thread; status and result live here so any worker can serve them."""
+    __tablename__ = 'background_jobs'
+    job_id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.String(500))
+    result = db.Column(db.Text(16777215))  # MEDIUMTEXT on MySQL
+    result_filename = db.Column(db.String(255))
+    result_mimetype = db.Column(db.String(100))
+    one_time_result = db.Column(db.Integer, nullable=False, default=0)  # cleared after first download
+    created_by = db.Column(db.Integer, db.ForeignKey('users.user_id'))
+    created_at = db.Column(db.DateTime, server_default=db.text("CURRENT_TIMESTAMP"))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_background_jobs_created_by', 'created_by', 'job_id'),
+    )
+
+
 def init_app(app):
     # Build DB URI from env, fallback to mysql settings in db.py
     db_user = os.environ.get('DB_USER', 'avnadmin')
@@ -76,6 +175,8 @@ def init_app(app):
         'DATABASE_URL', f'mysql+mysqlconnector://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}'
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Pool size, overflow, pre-ping and recycle come from DB_POOL_* env vars (see db.py)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options()
     db.init_app(app)
 
 
@@ -0,0 +1,150 @@
+import base64
+import json
+
+import cache
+
+
+PER_PAGE_CHOICES = (10, 25, 50, 100)
+DEFAULT_PER_PAGE = 10
+COUNT_TTL = 300  # seconds; list totals are only used for "of N" and page links
+
+
+def clamp_per_page(per_page):
+    return per_page if per_page in PER_PAGE_CHOICES else DEFAULT_PER_PAGE
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class PageRequest:
+    """
+    page/per_page plus an optional keyset cursor from the query string.
+    `prefix` separates two lists on one page, e.g. students_page / students_after.
+    """
+
+    def __init__(self, page=1, per_page=DEFAULT_PER_PAGE, after=None, before=None, prefix=""):
+        self.page = max(page or 1, 1)
+        self.per_page = clamp_per_page(per_page)
+        self.after = decode_cursor(after)
+        self.before = decode_cursor(before) if self.after is None else None
+        self.prefix = prefix
+
+    @classmethod
+    def from_args(cls, args, prefix=""):
+        return cls(
+            page=args.get(f"{prefix}page", 1, type=int),
+            per_page=args.get("per_page", DEFAULT_PER_PAGE, type=int),
+            after=args.get(f"{prefix}after"),
+            before=args.get(f"{prefix}before"),
+            prefix=prefix,
+        )
+
+
+def _keyset_condition(keys, cursor, forward):
+    """
+    Rows strictly after (forward) or before the cursor in ORDER BY `keys`
+    order, as an OR-expanded comparison so it works for mixed ASC/DESC keys.
+    """
+    params = {}
+    clauses = []
+    for i, (expr, direction) in enumerate(keys):
+        params[f"k_{i}"] = cursor[i]
+        ascending = (direction == "asc") == forward
+        parts = [f"{keys[j][0]} = :k_{j}" for j in range(i)]
+        parts.append(f"{expr} {'>' if ascending else '<'} :k_{i}")
+        clauses.append("(" + " AND ".join(parts) + ")")
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def _order_sql(keys, forward):
+    flip = {"asc": "DESC", "desc": "ASC"}
+    return ", ".join(f"{expr} {direction.upper() if forward else flip[direction]}" for expr, direction in keys)
+
+
+class Page:
+    """One page of rows plus what the templates need for prev/next and numbered links."""
+
+    def __init__(self, req, items, total, has_prev, has_next, first_key, last_key):
+        self.items = items
+        self.page = req.page
+        self.per_page = req.per_page
+        self.total = total
+        # total=None skips the count (infinite scroll only needs has_next)
+        self.pages = (max((total + req.per_page - 1) // req.per_page, req.page if items else 0)
+                      if total is not None else None)
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_num = req.page - 1
+        self.next_num = req.page + 1
+        self.prefix = req.prefix
+        self.first_cursor = encode_cursor(first_key) if first_key is not None else None
+        self.last_cursor = encode_cursor(last_key) if last_key is not None else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def prev_args(self):
+        return {f"{self.prefix}page": self.prev_num, f"{self.prefix}before": self.first_cursor,
+                "per_page": self.per_page}
+
+    def next_args(self):
+        return {f"{self.prefix}page": self.next_num, f"{self.prefix}after": self.last_cursor,
+                "per_page": self.per_page}
+
+    def page_args(self, page_num):
+        return {f"{self.prefix}page": page_num, "per_page": self.per_page}
+
+
+def paginate(run, keys, key_of, req, total):
+    """
+    Keyset-paginate a query.
+
+    run(where_sql, order_sql, limit, offset, params) executes the caller's
+    query with `AND {where_sql}` in its WHERE clause and `ORDER BY {order_sql}`.
+    keys are (sql expression, "asc"/"desc") pairs ending in a unique column;
+    key_of(row) returns the row's values for them. A cursor turns into a
+    WHERE condition; without one (numbered page links) the page is reached by
+    OFFSET. One extra row is fetched to tell whether there is a next page.
+    """
+    forward = req.before is None
+    cursor = req.after if forward else req.before
+    if cursor is not None and len(cursor) == len(keys):
+        where_sql, params = _keyset_condition(keys, cursor, forward)
+        offset = 0
+    else:
+        where_sql, params = "1 = 1", {}
+        offset = (req.page - 1) * req.per_page
+        forward = True
+
+    rows = list(run(where_sql, _order_sql(keys, forward), req.per_page + 1, offset, params))
+    more = len(rows) > req.per_page
+    rows = rows[:req.per_page]
+    if forward:
+        has_prev, has_next = req.page > 1, more
+    else:
+        rows.reverse()
+        has_prev, has_next = more, True
+
+    return Page(
+        req, rows, total, has_prev, has_next,
+        key_of(rows[0]) if rows else None,
+        key_of(rows[-1]) if rows else None,
+    )
+
+
+def cached_count(key, count_fn):
+    """Total rows for a list, cached under `key` (use a prefix that the list's writes invalidate)."""
+    return cache.cached(key, lambda: int(count_fn() or 0), ttl=COUNT_TTL)
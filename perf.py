@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from flask import request, before_render_template, template_rendered
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+SAMPLE_SIZE = int(os.environ.get("PERF_SAMPLE_SIZE", 500))   # requests kept per endpoint
+SLOW_STATEMENTS = 5                                          # slowest statements kept per request/endpoint
+STATEMENT_CHARS = 300
+
+logger = logging.getLogger("perf")
+
+# Not flask.g: routes that push a nested app_context() get a fresh g,
+# which would hide their queries from the request's stats
+_stats = ContextVar("perf_request_stats", default=None)
+
+
+class RequestStats:
+    """Timings gathered while a single request is served."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.serialize_time = 0.0
+        self.slowest = []   # (seconds, statement)
+        self._render_started = None
+
+    def add_query(self, seconds, statement):
+        self.queries += 1
+        self.db_time += seconds
+        self.slowest.append((seconds, " ".join(statement.split())[:STATEMENT_CHARS]))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[SLOW_STATEMENTS:]
+
+
+class EndpointStats:
+    """Rolling window of recent requests to one endpoint."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=SAMPLE_SIZE)  # (total_ms, db_ms, queries)
+        self.count = 0
+        self.slowest = []   # (ms, statement)
+
+    def add(self, total_ms, db_ms, queries, slowest):
+        self.count += 1
+        self.samples.append((total_ms, db_ms, queries))
+        merged = self.slowest + [(s * 1000, stmt) for s, stmt in slowest]
+        merged.sort(key=lambda item: item[0], reverse=True)
+        self.slowest = merged[:SLOW_STATEMENTS]
+
+
+_lock = threading.Lock()
+_endpoints = defaultdict(EndpointStats)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _current():
+    return _stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("perf_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("perf_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current()
+    if stats is not None:
+        stats.add_query(elapsed, statement)
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None:
+        stats._render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None and stats._render_started is not None:
+        stats.render_time += time.perf_counter() - stats._render_started
+        stats._render_started = None
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that also records how long jsonify spent serializing."""
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats = _current()
+            if stats is not None:
+                stats.serialize_time += time.perf_counter() - start
+
+
+def _start_request():
+    _stats.set(RequestStats())
+
+
+def _clear_request(exc=None):
+    # after_request is skipped when an exception propagates; never let stats outlive the request
+    _stats.set(None)
+
+
+def _finish_request(response):
+    stats = _stats.get()
+    if stats is None:
+        return response
+    _stats.set(None)
+
+    total_ms = (time.perf_counter() - stats.started) * 1000
+    db_ms = stats.db_time * 1000
+    render_ms = stats.render_time * 1000
+    serialize_ms = stats.serialize_time * 1000
+    endpoint = request.endpoint or "unknown"
+
+    response.headers["Server-Timing"] = ", ".join([
+        f'db;dur={db_ms:.1f};desc="{stats.queries} queries"',
+        f"render;dur={render_ms:.1f}",
+        f"serialize;dur={serialize_ms:.1f}",
+        f"total;dur={total_ms:.1f}",
+    ])
+
+    with _lock:
+        _endpoints[endpoint].add(total_ms, db_ms, stats.queries, stats.slowest)
+
+    logger.info(json.dumps({
+        "endpoint": endpoint,
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "total_ms": round(total_ms, 1),
+        "db_ms": round(db_ms, 1),
+        "queries": stats.queries,
+        "render_ms": round(render_ms, 1),
+        "serialize_ms": round(serialize_ms, 1),
+        "slowest_ms": round(stats.slowest[0][0] * 1000, 1) if stats.slowest else 0.0,
+    }))
+    return response
+
+
+def init_perf(app):
+    """Attach query/latency instrumentation unless PERF_ENABLED=0."""
+    if os.environ.get("PERF_ENABLED", "1").strip().lower() in ("0", "false", "no", "off"):
+        return
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_clear_request)
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s perf %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def endpoint_report():
+    """Per-endpoint latency percentiles, query counts and slowest statements, slowest p95 first."""
+    with _lock:
+        snapshot = {name: (list(s.samples), s.count, list(s.slowest)) for name, s in _endpoints.items()}
+
+    report = []
+    for name, (samples, count, slowest) in snapshot.items():
+        totals = sorted(s[0] for s in samples)
+        report.append({
+            "endpoint": name,
+            "count": count,
+            "p50_ms": round(_percentile(totals, 50), 1),
+            "p95_ms": round(_percentile(totals, 95), 1),
+            "p99_ms": round(_percentile(totals, 99), 1),
+            "max_ms": round(totals[-1], 1) if totals else 0.0,
+            "avg_db_ms": round(sum(s[1] for s in samples) / len(samples), 1) if samples else 0.0,
+            "avg_queries": round(sum(s[2] for s in samples) / len(samples), 1) if samples else 0.0,
+            "slowest": [{"ms": round(ms, 1), "statement": stmt} for ms, stmt in slowest],
+        })
+    report.sort(key=lambda r: r["p95_ms"], reverse=True)
+    return report
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
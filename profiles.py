@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import namedtuple
+
+import cache
+import reference
+from models import db
+
+
+# Admin edits drop the user's entry in this worker at once; the other workers
+# see the "profiles" data version change and drop theirs within CHECK_SECONDS.
+PROFILE_TTL = 300
+CHECK_SECONDS = reference.CHECK_SECONDS
+VERSION_NAME = "profiles"
+
+_lock = threading.Lock()
+_seen_version = None
+_checked_at = 0.0
+
+TeacherProfile = namedtuple("TeacherProfile", ["teacher_id", "subject_id"])
+StudentProfile = namedtuple("StudentProfile", ["student_id", "class_id"])
+
+
+def _sync():
+    """Clear this worker's cached profiles if another worker recorded a profile change."""
+    global _seen_version, _checked_at
+    if time.monotonic() - _checked_at < CHECK_SECONDS:
+        return
+    with _lock:
+        if time.monotonic() - _checked_at < CHECK_SECONDS:
+            return
+        version = reference.stored_version(VERSION_NAME)
+        if _seen_version is not None and version != _seen_version:
+            cache.invalidate("profile:")
+        _seen_version = version
+        _checked_at = time.monotonic()
+
+
+def teacher(user_id):
+    """The logged-in teacher's teacher_id / subject_id, or None without a teacher profile."""
+    _sync()
+    def load():
+        row = db.session.execute(db.text("""
+            SELECT teacher_id, subject_id
+            FROM teachers
+            WHERE users_user_id = :uid
+        """), {"uid": user_id}).fetchone()
+        return TeacherProfile(row.teacher_id, row.subject_id) if row else None
+    return cache.cached(f"profile:{user_id}:teacher", load, ttl=PROFILE_TTL)
+
+
+def student(user_id):
+    """The logged-in student's student_id / class_id, or None without a student profile."""
+    _sync()
+    def load():
+        row = db.session.execute(db.text("""
+            SELECT student_id, class_id
+            FROM students
+            WHERE users_user_id = :uid
+        """), {"uid": user_id}).fetchone()
+        return StudentProfile(row.student_id, row.class_id) if row else None
+    return cache.cached(f"profile:{user_id}:student", load, ttl=PROFILE_TTL)
+
+
+def load_for(user):
+    """Resolve the profile at login so the first page after it is already a cache hit."""
+    if user.role_id == 2:
+        return teacher(user.user_id)
+    if user.role_id == 3:
+        return student(user.user_id)
+    return None
+
+
+def invalidate(user_id):
+    """Call after an admin commits a change to the user's class, subject or profile row."""
+    cache.invalidate(f"profile:{user_id}:")
+    reference.bump_version(VERSION_NAME)
@@ -0,0 +1,98 @@
+from jinja2.utils import htmlsafe_json_dumps
+
+import cache
+from models import db
+
+
+# Keys include the content version, so an entry is never stale; the TTL only bounds memory
+QUIZ_CONTENT_TTL = 3600
+
+INSTRUCTIONS = [
+    "Read each question carefully before selecting your answer",
+    "You can navigate between questions using the Previous and Next buttons",
+    "Your answers will be auto-saved every 30 seconds",
+    "Make sure to submit your quiz before the timer runs out",
+    "Once submitted, you cannot change your answers"
+]
+
+def bump_version(quiz_id):
+    """Mark the quiz content as changed; runs inside the caller's transaction."""
+    db.session.execute(db.text("""
+        INSERT INTO quiz_content_versions (quiz_id, version)
+        VALUES (:qid, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """), {"qid": quiz_id})
+    cache.invalidate(f"quiz:{quiz_id}:")
+
+
+def current_version(quiz_id):
+    return db.session.execute(db.text(
+        "SELECT version FROM quiz_content_versions WHERE quiz_id = :qid"
+    ), {"qid": quiz_id}).scalar() or 0
+
+
+def _option_index(letter):
+    mapping = {"A": 0, "B": 1, "C": 2, "D": 3}
+    return mapping.get((letter or "").upper(), 0)
+
+
+def _build(quiz_id):
+    quiz_row = db.session.execute(db.text("""
+        SELECT
+            q.quiz_id,
+            q.title,
+            q.exam_type,
+            q.start_time,
+            q.end_time,
+            s.subject_name
+        FROM quizzes q
+        JOIN classes c ON c.class_id = q.class_id
+        JOIN subjects s ON s.subject_id = q.subject_id
+        WHERE q.quiz_id = :qid
+    """), {"qid": quiz_id}).fetchone()
+    if not quiz_row:
+        return {"question_count": 0, "json": "null"}
+
+    questions = db.session.execute(db.text("""
+        SELECT question_id, question_text, option_a, option_b, option_c, option_d, correct_option
+        FROM quiz_questions
+        WHERE quiz_id = :qid
+        ORDER BY question_id
+    """), {"qid": quiz_id}).fetchall()
+
+    duration_minutes = 30
+    if quiz_row.start_time and quiz_row.end_time:
+        duration_minutes = int((quiz_row.end_time - quiz_row.start_time).total_seconds() // 60)
+
+    quiz_data = {
+        "info": {
+            "id": quiz_row.quiz_id,
+            "title": quiz_row.title,
+            "subject": quiz_row.subject_name,
+            "timeLimit": duration_minutes,
+            "type": quiz_row.exam_type or "exam",
+            "instructions": INSTRUCTIONS,
+        },
+        "questions": [
+            {
+                "id": q.question_id,
+                "text": q.question_text,
+                "type": "mcq",
+                "options": [q.option_a, q.option_b, q.option_c, q.option_d],
+                "correctAnswer": _option_index(q.correct_option),
+            }
+            for q in questions
+        ]
+    }
+    # Serialized once, the same way the template's |tojson filter would
+    return {"question_count": len(questions), "json": str(htmlsafe_json_dumps(quiz_data))}
+
+
+def payload(quiz_id, version):
+    """Cached {"question_count", "json"} for the student quiz page."""
+    return cache.cached(f"quiz:{quiz_id}:{version}", lambda: _build(quiz_id), ttl=QUIZ_CONTENT_TTL)
+
+
+def warm(quiz_id):
+    """Build the payload ahead of the first student request, e.g. after a teacher saves the quiz."""
+    return payload(quiz_id, current_version(quiz_id))
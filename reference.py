@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import jsonify
+
+import conditional
+from models import db
+
+
+# How often a worker asks data_versions whether another worker changed the data
+CHECK_SECONDS = float(os.environ.get("REFERENCE_CHECK_SECONDS", 5))
+VERSION_NAME = "reference"
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+class ReferenceData:
+    """
+    One immutable load of classes, subjects, grade levels and teacher-class
+    assignments, indexed for the dropdown endpoints. Lists hold plain dicts,
+    which the templates read like rows.
+    """
+
+    def __init__(self, version, classes, subjects, class_subjects, class_teachers):
+        self.version = version
+        self.classes_by_id = {c["class_id"]: c for c in classes}
+        self.active_classes = sorted(
+            (c for c in classes if c["is_active"] == 1),
+            key=lambda c: (c["grade_level"] or "", c["class_name"] or ""),
+        )
+        self.active_classes_by_grade = {}
+        for c in self.active_classes:
+            self.active_classes_by_grade.setdefault(str(c["grade_level"]), []).append(c)
+        for rows in self.active_classes_by_grade.values():
+            rows.sort(key=lambda c: c["class_name"] or "")
+        self.grade_levels = sorted({c["grade_level"] for c in classes if c["grade_level"]})
+        self.academic_years = sorted({c["academic_year"] for c in classes if c["academic_year"]}, reverse=True)
+
+        self.subjects_by_id = {s["subject_id"]: s for s in subjects}
+        self.active_subjects = sorted(
+            (s for s in subjects if s["is_active"] == 1), key=lambda s: s["subject_name"] or ""
+        )
+        self.subjects_by_class = {}
+        for class_id, subject_id in class_subjects:
+            subject = self.subjects_by_id.get(subject_id)
+            if subject:
+                self.subjects_by_class.setdefault(class_id, []).append(subject)
+        for rows in self.subjects_by_class.values():
+            rows.sort(key=lambda s: s["subject_name"] or "")
+
+        # Active teachers per grade level, through their class assignments
+        self.teachers_by_grade = {}
+        self.classes_by_teacher = {}
+        names = set()
+        for class_id, teacher_id, full_name in class_teachers:
+            names.add(full_name)
+            c = self.classes_by_id.get(class_id)
+            if c is None:
+                continue
+            self.classes_by_teacher.setdefault(teacher_id, []).append(c)
+            by_id = self.teachers_by_grade.setdefault(str(c["grade_level"]), {})
+            by_id[teacher_id] = {"teacher_id": teacher_id, "full_name": full_name}
+        self.teachers_by_grade = {
+            grade: sorted(by_id.values(), key=lambda t: t["full_name"] or "")
+            for grade, by_id in self.teachers_by_grade.items()
+        }
+        self.active_teacher_names = sorted(n for n in names if n)
+        for rows in self.classes_by_teacher.values():
+            rows.sort(key=lambda c: (c["grade_level"] or "", c["class_name"] or ""))
+
+        digest = hashlib.sha1(json.dumps(
+            [classes, subjects, class_subjects, class_teachers], default=str, sort_keys=True
+        ).encode("utf-8")).hexdigest()[:16]
+        self.etag = f"ref-{version}-{digest}"
+
+
+def _load(version):
+    classes = [dict(r) for r in db.session.execute(db.text("""
+        SELECT class_id, class_name, grade_level, academic_year, is_active
+        FROM classes
+    """)).mappings()]
+    subjects = [dict(r) for r in db.session.execute(db.text("""
+        SELECT subject_id, subject_name, is_active
+        FROM subjects
+    """)).mappings()]
+    class_subjects = [tuple(r) for r in db.session.execute(db.text("""
+        SELECT classes_class_id, subjects_subject_id
+        FROM subjects_has_classes
+    """))]
+    class_teachers = [tuple(r) for r in db.session.execute(db.text("""
+        SELECT cht.classes_class_id, t.teacher_id, u.full_name
+        FROM classes_has_teachers cht
+        JOIN teachers t ON t.teacher_id = cht.teachers_teacher_id
+        JOIN users u ON u.user_id = t.users_user_id
+        WHERE u.is_active = 1
+    """))]
+    return ReferenceData(version, classes, subjects, class_subjects, class_teachers)
+
+
+def stored_version(name=VERSION_NAME):
+    return db.session.execute(db.text(
+        "SELECT version FROM data_versions WHERE name = :name"
+    ), {"name": name}).scalar() or 0
+
+
+def bump_version(name):
+    """Increment data_versions[name] in its own transaction; errors are printed, not raised."""
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(db.text("""
+                INSERT INTO data_versions (name, version)
+                VALUES (:name, 1)
+                ON DUPLICATE KEY UPDATE version = version + 1
+            """), {"name": name})
+    except Exception as e:
+        print(f"Data version bump error ({name}):", e)
+
+
+def get():
+    """
+    The current ReferenceData for this worker. The stored version is checked
+    at most every CHECK_SECONDS and the data reloaded only when it changed.
+    """
+    global _snapshot, _checked_at
+    if _snapshot is not None and time.monotonic() - _checked_at < CHECK_SECONDS:
+        return _snapshot
+    with _lock:
+        if _snapshot is None or time.monotonic() - _checked_at >= CHECK_SECONDS:
+            version = stored_version()
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = _load(version)
+            _checked_at = time.monotonic()
+    return _snapshot
+
+
+def bump():
+    """
+    Record that classes, subjects or teacher assignments changed. Call after
+    the write is committed; this worker reloads on its next read and the
+    others within CHECK_SECONDS.
+    """
+    global _checked_at
+    bump_version(VERSION_NAME)
+    _checked_at = 0.0
+
+
+def conditional_json(build):
+    """
+    JSON response for build(ReferenceData) with the data's ETag; a matching
+    If-None-Match gets an empty 304 without building the payload.
+    """
+    data = get()
+    return conditional.not_modified(data.etag) or conditional.tag(jsonify(build(data)), data.etag)
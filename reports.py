@@ -0,0 +1,222 @@
+from models import db
+
+
+# Effective score of a result row: prefer total_score, fall back to quiz_score.
+SCORE_EXPR = "COALESCE(tr.total_score, tr.quiz_score)"
+
+# Letter buckets shown on the admin report (label, bar colour, lower bound).
+GRADE_BUCKETS = [
+    ("A (90-100)", "#10b981", 90),
+    ("B (80-89)", "#3b82f6", 80),
+    ("C (70-79)", "#f59e0b", 70),
+    ("D (60-69)", "#f97316", 60),
+    ("F (<60)", "#ef4444", 0),
+]
+
+
+def _filter_sql(filters):
+    """Translate the report filters into extra WHERE conditions and bind params."""
+    conditions = []
+    params = {}
+    if filters.get("grade"):
+        conditions.append("AND c.grade_level = :grade")
+        params["grade"] = filters["grade"]
+    if filters.get("class"):
+        conditions.append("AND c.class_name = :class_name")
+        params["class_name"] = filters["class"]
+    if filters.get("subject"):
+        conditions.append("AND sub.subject_name = :subject_name")
+        params["subject_name"] = filters["subject"]
+    if filters.get("year"):
+        conditions.append("AND (c.academic_year = :year)")
+        params["year"] = filters["year"]
+    # term is ignored because test_results is not linked to quiz_id in the schema
+    return " ".join(conditions), params
+
+
+def _grouped_aggregates(filters):
+    """
+    Rollup rows summed per grade level and subject.
+    Every KPI on the report page is folded from these few rows in Python, so the
+    cost follows the number of classes rather than the number of results.
+    """
+    where_sql, params = _filter_sql(filters)
+    return db.session.execute(db.text(f"""
+        SELECT
+            c.grade_level,
+            sub.subject_name,
+            SUM(r.result_count) AS result_count,
+            SUM(r.score_sum) AS score_sum,
+            SUM(r.a_count) AS a_count,
+            SUM(r.b_count) AS b_count,
+            SUM(r.c_count) AS c_count,
+            SUM(r.d_count) AS d_count,
+            SUM(r.f_count) AS f_count
+        FROM result_rollups r
+        LEFT JOIN classes c ON c.class_id = r.class_id
+        LEFT JOIN subjects sub ON sub.subject_id = r.subject_id
+        WHERE 1=1 {where_sql}
+        GROUP BY c.grade_level, sub.subject_name
+        ORDER BY c.grade_level, sub.subject_name
+    """), params).fetchall()
+
+
+def summarize_groups(rows):
+    """Fold grouped aggregate rows into the KPI, distribution and chart payloads."""
+    total_results = 0
+    score_total = 0.0
+    bucket_counts = [0] * len(GRADE_BUCKETS)
+    subject_totals = {}
+    grade_totals = {}
+
+    for r in rows:
+        count = int(r.result_count or 0)
+        if not count:
+            continue
+        score_sum = float(r.score_sum or 0)
+        total_results += count
+        score_total += score_sum
+
+        counts = [r.a_count, r.b_count, r.c_count, r.d_count, r.f_count]
+        for i, value in enumerate(counts):
+            bucket_counts[i] += int(value or 0)
+
+        subject_key = r.subject_name or "Unknown"
+        acc = subject_totals.setdefault(subject_key, [0, 0.0])
+        acc[0] += count
+        acc[1] += score_sum
+
+        grade_key = f"Grade {r.grade_level}" if r.grade_level else "Ungraded"
+        acc = grade_totals.setdefault(grade_key, [0, 0.0])
+        acc[0] += count
+        acc[1] += score_sum
+
+    # A-D buckets are all >= the pass mark; F is everything below it
+    pass_count = sum(bucket_counts[:-1])
+    grade_distribution = []
+    for (label, color, _min), count in zip(GRADE_BUCKETS, bucket_counts):
+        grade_distribution.append({
+            "label": label,
+            "percent": round((count / total_results) * 100, 1) if total_results else 0,
+            "count": count,
+            "color": color,
+        })
+
+    return {
+        "total_results": total_results,
+        "average_score": round(score_total / total_results, 1) if total_results else 0.0,
+        "pass_rate": round((pass_count / total_results) * 100, 1) if total_results else 0.0,
+        "top_performers": bucket_counts[0],
+        "need_support": bucket_counts[-1],
+        "grade_distribution": grade_distribution,
+        "subject_averages": {
+            k: round(s / n, 1) for k, (n, s) in subject_totals.items()
+        },
+        "performance_trend": {
+            "labels": list(grade_totals.keys()),
+            "values": [round(s / n, 1) for n, s in grade_totals.values()],
+        },
+    }
+
+
+def report_aggregates(filters):
+    """KPIs, A-F distribution, per-subject and per-grade averages for the admin report."""
+    return summarize_groups(_grouped_aggregates(filters))
+
+
+def sample_results(filters, limit=50):
+    """Latest result rows for the report table, fetched with LIMIT instead of in Python."""
+    where_sql, params = _filter_sql(filters)
+    params["limit"] = limit
+    rows = db.session.execute(db.text(f"""
+        SELECT
+            tr.result_id,
+            tr.test_date,
+            tr.grade,
+            tr.student_id,
+            {SCORE_EXPR} AS score,
+            u.full_name,
+            u.username,
+            c.class_name,
+            sub.subject_name
+        FROM test_results tr
+        JOIN students st ON st.student_id = tr.student_id
+        JOIN users u ON u.user_id = st.users_user_id
+        LEFT JOIN classes c ON c.class_id = tr.class_id
+        LEFT JOIN subjects sub ON sub.subject_id = tr.subject_id
+        WHERE 1=1 {where_sql}
+        ORDER BY tr.test_date DESC, tr.result_id DESC
+        LIMIT :limit
+    """), params).fetchall()
+
+    results = []
+    for r in rows:
+        try:
+            score_val = float(r.score) if r.score is not None else None
+        except (TypeError, ValueError):
+            score_val = None
+
+        grade_val = r.grade if r.grade is not None else score_val
+        remarks = "Excellent" if score_val is not None and score_val >= 90 else "Needs support" if score_val is not None and score_val < 60 else "Good"
+        results.append({
+            "student_id": r.student_id,
+            "name": r.full_name or r.username,
+            "class_name": r.class_name or "N/A",
+            "subject": r.subject_name or "N/A",
+            "test_date": r.test_date.strftime("%Y-%m-%d") if r.test_date else "",
+            "score": score_val if score_val is not None else "--",
+            "grade": grade_val if grade_val is not None else "--",
+            "remarks": remarks,
+        })
+    return results
+
+
+# (row key, CSV header) for the admin report export
+EXPORT_COLUMNS = [
+    ("result_id", "Result ID"),
+    ("test_date", "Test Date"),
+    ("student_id", "Student ID"),
+    ("full_name", "Student Name"),
+    ("username", "Username"),
+    ("grade_level", "Grade Level"),
+    ("class_name", "Class"),
+    ("academic_year", "Academic Year"),
+    ("subject_name", "Subject"),
+    ("quiz_score", "Quiz"),
+    ("assignment_score", "Assignment"),
+    ("midterm_score", "Midterm"),
+    ("final_score", "Final"),
+    ("score", "Score"),
+    ("grade", "Grade"),
+]
+
+
+def export_sql(filters):
+    """Every result row behind the report, in the keyset form exports.iter_batches expects."""
+    where_sql, params = _filter_sql(filters)
+    return f"""
+        SELECT
+            tr.result_id,
+            tr.test_date,
+            tr.student_id,
+            u.full_name,
+            u.username,
+            c.grade_level,
+            c.class_name,
+            c.academic_year,
+            sub.subject_name,
+            tr.quiz_score,
+            tr.assignment_score,
+            tr.midterm_score,
+            tr.final_score,
+            {SCORE_EXPR} AS score,
+            tr.grade
+        FROM test_results tr
+        JOIN students st ON st.student_id = tr.student_id
+        JOIN users u ON u.user_id = st.users_user_id
+        LEFT JOIN classes c ON c.class_id = tr.class_id
+        LEFT JOIN subjects sub ON sub.subject_id = tr.subject_id
+        WHERE tr.result_id > :after_id {where_sql}
+        ORDER BY tr.result_id
+        LIMIT :batch_size
+    """, params
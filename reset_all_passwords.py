@@ -1,32 +1,208 @@
+import argparse
+import json
+import os
+import time
 
-from app import app, db
-from models import User
-from werkzeug.security import generate_password_hash
+from models import db
+from bulk import hash_passwords, hash_pool, hash_workers, update_rows
 
 
-def reset_all_passwords():
-    with app.app_context():
-        users = User.query.all()
-        fixed_count = 0
+ROLE_IDS = {"admin": 1, "teacher": 2, "student": 3}
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_CHECKPOINT = ".reset_passwords.checkpoint"
+
+
+def _filter_sql(role_id=None, class_id=None, academic_year=None, exclude_role_ids=(), exclude_user_id=None):
+    """WHERE conditions selecting the users to reset; class/year match students and their teachers."""
+    conditions = []
+    params = {}
+    if role_id:
+        conditions.append("AND u.role_id = :role_id")
+        params["role_id"] = role_id
+    for i, excluded in enumerate(exclude_role_ids):
+        conditions.append(f"AND u.role_id <> :exclude_role_{i}")
+        params[f"exclude_role_{i}"] = excluded
+    if exclude_user_id:
+        conditions.append("AND u.user_id <> :exclude_user_id")
+        params["exclude_user_id"] = exclude_user_id
+
+    class_conditions = []
+    if class_id:
+        class_conditions.append("c.class_id = :class_id")
+        params["class_id"] = class_id
+    if academic_year:
+        class_conditions.append("c.academic_year = :academic_year")
+        params["academic_year"] = academic_year
+    if class_conditions:
+        class_sql = " AND ".join(class_conditions)
+        conditions.append(f"""
+            AND (
+                EXISTS (
+                    SELECT 1 FROM students s
+                    JOIN classes c ON c.class_id = s.class_id
+                    WHERE s.users_user_id = u.user_id AND {class_sql}
+                )
+                OR EXISTS (
+                    SELECT 1 FROM teachers t
+                    JOIN classes_has_teachers cht ON cht.teachers_teacher_id = t.teacher_id
+                    JOIN classes c ON c.class_id = cht.classes_class_id
+                    WHERE t.users_user_id = u.user_id AND {class_sql}
+                )
+            )
+        """)
+    return " ".join(conditions), params
+
+
+def _read_checkpoint(path, signature):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("filters") != signature:
+        raise SystemExit(f"Checkpoint {path} was written for different filters: {data.get('filters')}")
+    return int(data.get("last_user_id", 0))
+
+
+def _write_checkpoint(path, signature, last_user_id):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"filters": signature, "last_user_id": last_user_id}, f)
+    os.replace(tmp, path)
+
+
+def reset_passwords(progress=None, on_update=None, role_id=None, class_id=None, academic_year=None,
+                    exclude_role_ids=(), exclude_user_id=None,
+                    chunk_size=DEFAULT_CHUNK_SIZE, workers=None, dry_run=False,
+                    checkpoint=None, resume=False):
+    """
+    Reset matching users to '<firstname>123@@' and force a password change.
+
+    Users are streamed in user_id order, `chunk_size` at a time. Each chunk is
+    hashed across a process pool and written with one bulk UPDATE and commit,
+    after which `checkpoint` (if given) records the last user_id so an
+    interrupted run can continue with resume=True. dry_run hashes but writes
+    nothing. on_update(username, password) is called for every reset user.
+    exclude_role_ids / exclude_user_id keep those users out of the run.
+    Returns throughput stats.
+    """
+    where_sql, params = _filter_sql(role_id, class_id, academic_year, exclude_role_ids, exclude_user_id)
+    signature = {"role_id": role_id, "class_id": class_id, "academic_year": academic_year,
+                 "exclude_role_ids": list(exclude_role_ids), "exclude_user_id": exclude_user_id}
+    last_id = _read_checkpoint(checkpoint, signature) if resume else 0
+
+    total = db.session.execute(db.text(f"""
+        SELECT COUNT(*) FROM users u WHERE u.user_id > :after {where_sql}
+    """), dict(params, after=last_id)).scalar() or 0
 
-        for user in users:
-            first = (user.full_name.split()[0]).lower()
+    workers = hash_workers() if workers is None else workers
+    stats = {"users": 0, "chunks": 0, "hash_seconds": 0.0, "db_seconds": 0.0, "dry_run": dry_run}
+    started = time.perf_counter()
 
-            new_plain = f"{first}123@@"
-            new_hash = generate_password_hash(new_plain)
+    executor = hash_pool(workers) if workers > 1 else None
+    try:
+        while True:
+            t0 = time.perf_counter()
+            rows = db.session.execute(db.text(f"""
+                SELECT u.user_id, u.username, u.full_name
+                FROM users u
+                WHERE u.user_id > :after {where_sql}
+                ORDER BY u.user_id
+                LIMIT :limit
+            """), dict(params, after=last_id, limit=chunk_size)).fetchall()
+            stats["db_seconds"] += time.perf_counter() - t0
+            if not rows:
+                break
 
-            print(f"[UPDATE] {user.username} → {new_plain}")
+            plain = []
+            for r in rows:
+                first = ((r.full_name or r.username or "").split() or ["user"])[0].lower()
+                plain.append(f"{first}123@@")
 
-            user.password = new_hash
-            user.force_password_change = 1
-            fixed_count += 1
+            t0 = time.perf_counter()
+            hashes = hash_passwords(plain, workers=workers, executor=executor)
+            stats["hash_seconds"] += time.perf_counter() - t0
 
-        db.session.commit()
+            if not dry_run:
+                t0 = time.perf_counter()
+                update_rows("users", "user_id", ["password"], [
+                    {"user_id": r.user_id, "password": h} for r, h in zip(rows, hashes)
+                ], extra_set="force_password_change = 1")
+                db.session.commit()
+                stats["db_seconds"] += time.perf_counter() - t0
+
+            last_id = rows[-1].user_id
+            if checkpoint and not dry_run:
+                _write_checkpoint(checkpoint, signature, last_id)
+
+            stats["users"] += len(rows)
+            stats["chunks"] += 1
+            if on_update:
+                for r, p in zip(rows, plain):
+                    on_update(r.username, p)
+            if progress:
+                progress(stats["users"], total)
+
+            # Release the chunk's rows before fetching the next one
+            db.session.expunge_all()
+    finally:
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["users_per_second"] = round(stats["users"] / elapsed, 1) if elapsed else 0.0
+    stats["hash_seconds"] = round(stats["hash_seconds"], 2)
+    stats["db_seconds"] = round(stats["db_seconds"], 2)
+    stats["last_user_id"] = last_id
+    return stats
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reset user passwords to '<firstname>123@@' in batches.")
+    parser.add_argument("--role", choices=sorted(ROLE_IDS), help="only reset users with this role")
+    parser.add_argument("--class-id", type=int, help="only students in / teachers of this class")
+    parser.add_argument("--academic-year", help="only students in / teachers of classes in this year")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: PASSWORD_HASH_WORKERS or the CPU count)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="progress file for --resume")
+    parser.add_argument("--resume", action="store_true", help="continue after the last checkpointed user")
+    parser.add_argument("--dry-run", action="store_true", help="hash but do not write; report throughput")
+    parser.add_argument("--quiet", action="store_true", help="do not print each new password")
+    return parser.parse_args(argv)
+
+
+def reset_all_passwords(argv=None):
+    args = _parse_args(argv)
+    from app import app
+
+    def show(username, new_plain):
+        print(f"[{'DRY RUN' if args.dry_run else 'UPDATE'}] {username} → {new_plain}")
+
+    with app.app_context():
+        stats = reset_passwords(
+            on_update=None if args.quiet else show,
+            role_id=ROLE_IDS.get(args.role),
+            class_id=args.class_id,
+            academic_year=args.academic_year,
+            chunk_size=args.chunk_size,
+            # The CLI owns the machine; web jobs keep the capped default
+            workers=args.workers if args.workers is not None else hash_workers(limit=None),
+            dry_run=args.dry_run,
+            checkpoint=args.checkpoint,
+            resume=args.resume,
+        )
 
         print("--------------------------------------------------")
-        print(f"Completed! Updated {fixed_count} user passwords.")
+        verb = "Would update" if args.dry_run else "Completed! Updated"
+        print(f"{verb} {stats['users']} user passwords in {stats['chunks']} chunks.")
+        print(f"{stats['seconds']}s total, {stats['users_per_second']} users/s "
+              f"(hashing {stats['hash_seconds']}s, database {stats['db_seconds']}s)")
         print("--------------------------------------------------")
 
+        if not args.dry_run and args.checkpoint and os.path.exists(args.checkpoint):
+            # Finished cleanly; a later run should start from the beginning
+            os.remove(args.checkpoint)
+
 
 # -------------------------------------------------------------
 # Script will only run manually.
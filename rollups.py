@@ -0,0 +1,78 @@
+from models import db, ResultRollup
+from reports import SCORE_EXPR
+
+
+ROLLUP_COLUMNS = (
+    "class_id, subject_id, teacher_id, academic_year, "
+    "result_count, score_sum, score_sq_sum, pass_count, "
+    "a_count, b_count, c_count, d_count, f_count, "
+    "first_test_date, last_test_date"
+)
+
+
+def _rollup_select(where_sql=""):
+    """Aggregate test_results into rollup rows (one per class/subject/teacher/year)."""
+    score = SCORE_EXPR
+    return f"""
+        SELECT
+            COALESCE(tr.class_id, 0),
+            COALESCE(tr.subject_id, 0),
+            COALESCE(tr.teacher_id, 0),
+            COALESCE(c.academic_year, ''),
+            COUNT({score}),
+            COALESCE(SUM({score}), 0),
+            COALESCE(SUM({score} * {score}), 0),
+            SUM(CASE WHEN {score} >= 60 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN {score} >= 90 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN {score} >= 80 AND {score} < 90 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN {score} >= 70 AND {score} < 80 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN {score} >= 60 AND {score} < 70 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN {score} < 60 THEN 1 ELSE 0 END),
+            MIN(tr.test_date),
+            MAX(tr.test_date)
+        FROM test_results tr
+        LEFT JOIN classes c ON c.class_id = tr.class_id
+        {where_sql}
+        GROUP BY 1, 2, 3, 4
+    """
+
+
+def apply_result(result_id):
+    """
+    Fold one freshly inserted test_results row into its rollup.
+    Runs on the caller's session so it commits together with the result insert.
+    """
+    db.session.execute(db.text(f"""
+        INSERT INTO result_rollups ({ROLLUP_COLUMNS})
+        {_rollup_select("WHERE tr.result_id = :rid")}
+        ON DUPLICATE KEY UPDATE
+            result_count = result_count + VALUES(result_count),
+            score_sum = score_sum + VALUES(score_sum),
+            score_sq_sum = score_sq_sum + VALUES(score_sq_sum),
+            pass_count = pass_count + VALUES(pass_count),
+            a_count = a_count + VALUES(a_count),
+            b_count = b_count + VALUES(b_count),
+            c_count = c_count + VALUES(c_count),
+            d_count = d_count + VALUES(d_count),
+            f_count = f_count + VALUES(f_count),
+            first_test_date = LEAST(COALESCE(first_test_date, VALUES(first_test_date)),
+                                    COALESCE(VALUES(first_test_date), first_test_date)),
+            last_test_date = GREATEST(COALESCE(last_test_date, VALUES(last_test_date)),
+                                      COALESCE(VALUES(last_test_date), last_test_date))
+    """), {"rid": result_id})
+
+
+def rebuild():
+    """Recompute every rollup row from test_results (backfills, manual data fixes)."""
+    ResultRollup.__table__.create(db.engine, checkfirst=True)
+    try:
+        db.session.execute(db.text("DELETE FROM result_rollups"))
+        db.session.execute(db.text(f"""
+            INSERT INTO result_rollups ({ROLLUP_COLUMNS})
+            {_rollup_select()}
+        """))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return db.session.execute(db.text("SELECT COUNT(*) FROM result_rollups")).scalar()
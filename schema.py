@@ -0,0 +1,40 @@
+from sqlalchemy import inspect
+
+import rollups
+from models import db, BackgroundJob, DataVersion, QuizContentVersion, QuizDraft, ResultRollup
+
+
+# Tables the app adds to the original schema. They are created by
+# `flask --app app create-tables` and once at server start (gunicorn.conf.py),
+# never from inside a request.
+APP_TABLES = [QuizContentVersion, ResultRollup, QuizDraft, DataVersion, BackgroundJob]
+
+
+def create_tables():
+    """Create the APP_TABLES that are missing and return their names."""
+    existing = set(inspect(db.engine).get_table_names())
+    created = []
+    for model in APP_TABLES:
+        if model.__tablename__ not in existing:
+            model.__table__.create(db.engine, checkfirst=True)
+            created.append(model.__tablename__)
+    return created
+
+
+def rollups_need_backfill():
+    """True when result_rollups is empty but test_results is not (new table, or never rebuilt)."""
+    return bool(db.session.execute(db.text("""
+        SELECT
+            EXISTS (SELECT 1 FROM test_results)
+            AND NOT EXISTS (SELECT 1 FROM result_rollups)
+    """)).scalar())
+
+
+def prepare():
+    """Everything the app needs from the database before serving; returns a list of log lines."""
+    lines = [f"Created table {name}" for name in create_tables()]
+    # The reports read result_rollups instead of test_results, so an empty
+    # table would show zeros; fill it before the first request.
+    if rollups_need_backfill():
+        lines.append(f"Backfilled result_rollups: {rollups.rebuild()} rows")
+    return lines
@@ -0,0 +1,166 @@
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+import activity
+import cache
+import drafts
+import quiz_content
+import rollups
+from models import db
+
+
+OPTION_INDEX = {"A": 0, "B": 1, "C": 2, "D": 3}
+# UNIQUE (quiz_id, student_id) on quiz_results; created by `flask create-indexes`
+UNIQUE_INDEX = "uq_quiz_results_quiz_student"  # also listed in models.HOT_INDEXES
+
+
+class SubmissionError(Exception):
+    """A submission that cannot be accepted; carries the HTTP status for the JSON response."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def answer_key(quiz_id, version):
+    """{question_id: correct option index} for the quiz content version, cached like the quiz payload."""
+    def load():
+        rows = db.session.execute(db.text("""
+            SELECT question_id, correct_option
+            FROM quiz_questions
+            WHERE quiz_id = :qid
+        """), {"qid": quiz_id}).fetchall()
+        return {r.question_id: OPTION_INDEX.get((r.correct_option or "").upper(), -2) for r in rows}
+    return cache.cached(f"quiz:{quiz_id}:{version}:key", load, ttl=quiz_content.QUIZ_CONTENT_TTL)
+
+
+def letter_grade(score):
+    if score >= 90:
+        return "A"
+    if score >= 80:
+        return "B"
+    if score >= 70:
+        return "C"
+    if score >= 60:
+        return "D"
+    return "F"
+
+
+def grade(key, answer_map):
+    """Score answer_map ({question_id: letter}) against an answer key; returns (correct, total, percent)."""
+    total = len(key)
+    correct = sum(
+        1 for qid, expected in key.items()
+        if answer_map.get(qid) and OPTION_INDEX.get(answer_map[qid], -1) == expected
+    )
+    return correct, total, round((correct / total) * 100, 2)
+
+
+def parse_answers(payload):
+    answers = (payload or {}).get("answers") or []
+    if not answers:
+        raise SubmissionError("No answers submitted.")
+    answer_map = {
+        int(item.get("question_id")): (item.get("selected_option") or "").upper()
+        for item in answers if item.get("question_id")
+    }
+    if not answer_map:
+        raise SubmissionError("Invalid answers payload.")
+    return answer_map
+
+
+def submit(user_id, quiz_id, answer_map, now=None, commit=True):
+    """
+    Grade and record one quiz submission.
+
+    One read checks the student, the quiz window, an earlier submission and
+    the content version; the answer key comes from cache. quiz_results,
+    test_results and the rollup are then written, and the auto-saved draft
+    removed, in a single transaction, and the activity log entry is queued
+    after the commit. Two concurrent duplicates can both pass the read; with
+    UNIQUE_INDEX in place the second insert fails instead. commit=False rolls
+    back instead (benchmarks). Raises SubmissionError; returns the JSON result.
+    """
+    now = now or datetime.now()
+
+    row = db.session.execute(db.text("""
+        SELECT
+            s.student_id,
+            s.class_id AS student_class_id,
+            q.quiz_id,
+            q.class_id,
+            q.subject_id,
+            q.teacher_id,
+            q.start_time,
+            q.end_time,
+            COALESCE(v.version, 0) AS content_version,
+            EXISTS (
+                SELECT 1 FROM quiz_results qr
+                WHERE qr.quiz_id = q.quiz_id AND qr.student_id = s.student_id
+            ) AS already_submitted
+        FROM students s
+        LEFT JOIN quizzes q ON q.quiz_id = :qid AND q.is_active = 1
+        LEFT JOIN quiz_content_versions v ON v.quiz_id = q.quiz_id
+        WHERE s.users_user_id = :uid
+    """), {"uid": user_id, "qid": quiz_id}).fetchone()
+
+    if not row:
+        raise SubmissionError("Student profile not found.", 404)
+    if row.quiz_id is None or row.class_id != row.student_class_id:
+        raise SubmissionError("Quiz not available.", 404)
+    if row.start_time and now < row.start_time:
+        raise SubmissionError("Quiz not open yet.", 403)
+    if row.end_time and now > row.end_time:
+        raise SubmissionError("Quiz has closed.", 403)
+    if row.already_submitted:
+        raise SubmissionError("Quiz already submitted.")
+
+    key = answer_key(quiz_id, row.content_version)
+    if not key:
+        raise SubmissionError("Quiz has no questions.")
+    correct, total, score_percent = grade(key, answer_map)
+    submitted_at = datetime.utcnow()
+
+    try:
+        # First, so a racing duplicate fails on the unique key before anything else is written
+        db.session.execute(db.text("""
+            INSERT INTO quiz_results (quiz_id, student_id, score, submitted_at)
+            VALUES (:qid, :sid, :score, :time)
+        """), {"qid": quiz_id, "sid": row.student_id, "score": score_percent, "time": submitted_at})
+    except IntegrityError:
+        db.session.rollback()
+        raise SubmissionError("Quiz already submitted.")
+
+    try:
+        result = db.session.execute(db.text("""
+            INSERT INTO test_results (test_date, student_id, class_id, subject_id, teacher_id, quiz_score)
+            VALUES (:test_date, :student_id, :class_id, :subject_id, :teacher_id, :quiz_score)
+        """), {
+            "test_date": submitted_at,
+            "student_id": row.student_id,
+            "class_id": row.class_id,
+            "subject_id": row.subject_id,
+            "teacher_id": row.teacher_id,
+            "quiz_score": score_percent
+        })
+        rollups.apply_result(result.lastrowid)
+        drafts.discard(quiz_id, user_id)
+        if commit:
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if commit:
+        activity.record(user_id, f"Submitted quiz {quiz_id} with score {score_percent}%.")
+
+    return {
+        "ok": True,
+        "score": score_percent,
+        "correct": correct,
+        "total": total,
+        "grade": letter_grade(score_percent)
+    }
@@ -0,0 +1,196 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+from models import db
+
+
+# Run the independent dashboard queries side by side on separate pooled
+# connections. Each dashboard request then holds up to three connections,
+# so keep DB_POOL_SIZE + DB_MAX_OVERFLOW in mind before turning it on.
+PARALLEL = os.environ.get("TEACHER_DASHBOARD_PARALLEL", "0").strip().lower() in ("1", "true", "yes", "on")
+PAYLOAD_TTL = 300  # keys carry the teacher's data version, so the TTL only bounds memory
+
+# Every class assigned to the teacher, active or not; the aggregates below join it
+CLASS_SCOPE_CTE = """
+    WITH teacher_classes AS (
+        SELECT c.class_id, c.class_name, c.grade_level, c.is_active
+        FROM classes_has_teachers cht
+        JOIN classes c ON c.class_id = cht.classes_class_id
+        WHERE cht.teachers_teacher_id = :tid
+    )
+"""
+
+CLASS_STATS_SQL = CLASS_SCOPE_CTE + """
+    SELECT
+        tc.class_id,
+        tc.class_name,
+        tc.grade_level,
+        tc.is_active,
+        COALESCE(sc.student_count, 0) AS student_count,
+        COALESCE(rr.pass_count, 0) AS pass_count,
+        COALESCE(rr.fail_count, 0) AS fail_count,
+        COALESCE(qc.test_count, 0) AS test_count
+    FROM teacher_classes tc
+    LEFT JOIN (
+        SELECT s.class_id, COUNT(*) AS student_count
+        FROM students s
+        JOIN teacher_classes t ON t.class_id = s.class_id
+        GROUP BY s.class_id
+    ) sc ON sc.class_id = tc.class_id
+    LEFT JOIN (
+        SELECT r.class_id, SUM(r.pass_count) AS pass_count, SUM(r.result_count - r.pass_count) AS fail_count
+        FROM result_rollups r
+        JOIN teacher_classes t ON t.class_id = r.class_id
+        WHERE r.teacher_id = :tid
+        GROUP BY r.class_id
+    ) rr ON rr.class_id = tc.class_id
+    LEFT JOIN (
+        SELECT q.class_id, COUNT(*) AS test_count
+        FROM quizzes q
+        JOIN teacher_classes t ON t.class_id = q.class_id
+        WHERE q.teacher_id = :tid
+        GROUP BY q.class_id
+    ) qc ON qc.class_id = tc.class_id
+    ORDER BY tc.grade_level, tc.class_name
+"""
+
+UPCOMING_SQL = """
+    SELECT
+        q.quiz_id,
+        q.title,
+        q.start_time,
+        q.end_time,
+        c.class_name,
+        s.subject_name
+    FROM quizzes q
+    JOIN classes c ON c.class_id = q.class_id
+    JOIN subjects s ON s.subject_id = q.subject_id
+    WHERE q.teacher_id = :tid
+      AND q.is_active = 1
+      AND q.start_time >= NOW()
+    ORDER BY q.start_time ASC
+    LIMIT 5
+"""
+
+RECENT_RESULTS_SQL = """
+    SELECT
+        tr.result_id,
+        tr.test_date,
+        tr.quiz_score,
+        tr.grade,
+        u.full_name AS student_name,
+        c.class_name,
+        s.subject_name
+    FROM test_results tr
+    JOIN students st ON st.student_id = tr.student_id
+    JOIN users u ON u.user_id = st.users_user_id
+    JOIN classes c ON c.class_id = tr.class_id
+    JOIN subjects s ON s.subject_id = tr.subject_id
+    WHERE tr.teacher_id = :tid
+    ORDER BY tr.test_date DESC
+    LIMIT 5
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="teacher-dashboard")
+    return _executor
+
+
+def _fetch_on(engine, sql, params):
+    with engine.connect() as conn:
+        return conn.execute(db.text(sql), params).fetchall()
+
+
+def _fetch_all(statements, params):
+    """Run independent SELECTs, concurrently on their own connections when PARALLEL is on."""
+    if not PARALLEL:
+        return [db.session.execute(db.text(sql), params).fetchall() for sql in statements]
+    engine = db.engine
+    # copy_context keeps the per-request query stats (perf.py) counting in the worker threads
+    futures = [
+        _get_executor().submit(contextvars.copy_context().run, _fetch_on, engine, sql, params)
+        for sql in statements
+    ]
+    return [f.result() for f in futures]
+
+
+def build(teacher_id, total_tests, total_results):
+    """The /teacher/dashboard/data payload; the two totals come from the caller's version query."""
+    class_rows, upcoming, recent_rows = _fetch_all(
+        [CLASS_STATS_SQL, UPCOMING_SQL, RECENT_RESULTS_SQL], {"tid": teacher_id}
+    )
+
+    active = [r for r in class_rows if r.is_active == 1]
+    tests_by_grade = {}
+    for r in active:
+        tests_by_grade[r.grade_level] = tests_by_grade.get(r.grade_level, 0) + int(r.test_count or 0)
+
+    recent_results = []
+    for r in recent_rows:
+        grade_val = r.grade if r.grade is not None else r.quiz_score
+        recent_results.append({
+            "result_id": r.result_id,
+            "student_name": r.student_name,
+            "class_name": r.class_name,
+            "subject_name": r.subject_name,
+            "score": float(r.quiz_score) if r.quiz_score is not None else None,
+            "grade": float(grade_val) if isinstance(grade_val, (int, float)) else grade_val,
+            "test_date": r.test_date.isoformat() if r.test_date else None,
+        })
+
+    return {
+        "summary": {
+            # A student belongs to one class, so per-class counts add up to distinct students
+            "total_students": sum(int(r.student_count or 0) for r in class_rows),
+            "total_classes": len(active),
+            "total_tests": int(total_tests or 0),
+            "total_results": int(total_results or 0),
+        },
+        "upcoming_tests": [
+            {
+                "quiz_id": r.quiz_id,
+                "title": r.title,
+                "class_name": r.class_name,
+                "subject_name": r.subject_name,
+                "start_time": r.start_time.isoformat() if r.start_time else None,
+                "end_time": r.end_time.isoformat() if r.end_time else None,
+            }
+            for r in upcoming
+        ],
+        "recent_results": recent_results,
+        "pass_fail": [
+            {
+                "class_name": r.class_name,
+                "pass_count": int(r.pass_count or 0),
+                "fail_count": int(r.fail_count or 0),
+            }
+            for r in active
+        ],
+        "tests_by_grade": [
+            {"grade_level": grade, "test_count": count}
+            for grade, count in tests_by_grade.items()
+        ],
+    }
+
+
+def payload(teacher_id, version_key, total_tests, total_results):
+    """
+    Cached build() per teacher. version_key changes whenever a quiz or result
+    for the teacher is written (see app._teacher_data_version), so a stale
+    payload is never served and no write path has to invalidate it.
+    """
+    return cache.cached(
+        f"teacher:{teacher_id}:dashboard:{version_key}",
+        lambda: build(teacher_id, total_tests, total_results),
+        ttl=PAYLOAD_TTL,
+    )